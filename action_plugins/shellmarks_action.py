@@ -0,0 +1,194 @@
+"""The action plugin of the module shellmarks. It runs on the controller
+and skips the execution of the module on the target if the bookmark file
+on the target has the same content as after the last run with the same
+arguments and all bookmarked directories with the state present still
+exist. The content is compared by a SHA-256 digest, which is computed by
+the same shell command on the target that checks the directories, so no
+Python interpreter is started.
+
+The digests are stored on the controller in one JSON file per host in
+the directory :data:`CACHE_DIR`.
+
+Install the plugin under the name of the module into a directory of the
+action plugin path, for example ``~/.ansible/plugins/action/shellmarks.py``.
+The file has a different name in the repository, because Ansible also
+searches the subdirectories of the module path for modules.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shlex
+import tempfile
+from typing import Any, Optional
+
+from ansible.plugins.action import ActionBase
+from ansible.utils.vars import merge_hash
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ansible", "shellmarks")
+"""The directory of the digest cache files on the controller."""
+
+UNCACHEABLE_ARGS = ("cleanup", "export")
+"""The arguments whose result depends on more than the bookmark file and
+the paths of the task: the existence of all bookmarked directories and
+external commands."""
+
+
+def present_paths(args: dict[str, Any]) -> Optional[list[str]]:
+    """The paths of the bookmarks with the state present, quoted for the
+    shell of the target. The module fails if one of them doesn’t exist.
+
+    :param args: The arguments of the task.
+
+    :return: The quoted paths or None if a path can’t be checked by the
+      shell, for example a relative path, which the module resolves
+      against its working directory.
+    """
+    items = [args] + list(args.get("marks") or [])
+    paths: list[str] = []
+    for item in items:
+        path = item.get("path") or item.get("src")
+        if not path or (item.get("state") or "present") != "present":
+            continue
+        path = str(path)
+        if path.startswith("$HOME"):
+            path = "~" + path[5:]
+        if path == "~" or path.startswith("~/"):
+            paths.append('"$HOME"' + shlex.quote(path[1:]))
+        elif path.startswith("/"):
+            paths.append(shlex.quote(path))
+        else:
+            return None
+    return paths
+
+
+class ActionModule(ActionBase):
+    _supports_check_mode = True
+    _supports_async = True
+
+    def run(
+        self, tmp: Optional[str] = None, task_vars: Optional[dict[str, Any]] = None
+    ) -> dict[str, Any]:
+        if task_vars is None:
+            task_vars = {}
+        result = super().run(tmp, task_vars)
+        del tmp
+
+        args = self._task.args
+        wrap_async = self._task.async_val and not self._connection.has_native_async
+        cacheable = not wrap_async and not any(
+            args.get(name) for name in UNCACHEABLE_ARGS
+        )
+
+        host = str(task_vars.get("inventory_hostname", ""))
+        sdirs = ""
+        key = ""
+        paths = present_paths(args) if cacheable else None
+        if paths is None:
+            cacheable = False
+        else:
+            sdirs = args.get("sdirs") or "~/.sdirs"
+            if sdirs.startswith("$HOME"):
+                sdirs = "~" + sdirs[5:]
+            sdirs = self._remote_expand_user(sdirs)
+            key = hashlib.sha256(
+                json.dumps([sdirs, args], sort_keys=True, default=str).encode()
+            ).hexdigest()
+            digest = self._remote_digest(sdirs, paths)
+            if digest is not None and self._read_cache(host).get(key) == digest:
+                result["changed"] = False
+                return result
+
+        result = merge_hash(
+            result, self._execute_module(task_vars=task_vars, wrap_async=wrap_async)
+        )
+
+        if not wrap_async:
+            self._remove_tmp_path(self._connection._shell.tmpdir)
+
+        # In check mode the bookmark file of a changed result isn’t written.
+        converged = not result.get("failed") and not (
+            self._task.check_mode and result.get("changed")
+        )
+        if cacheable and converged and paths is not None:
+            digest = self._remote_digest(sdirs, paths)
+            if digest is not None:
+                self._write_cache(host, key, digest)
+        return result
+
+    def _remote_digest(
+        self, path: str, directories: Optional[list[str]] = None
+    ) -> Optional[str]:
+        """The SHA-256 digest of a file on the target or None if the file
+        can’t be read or one of the directories doesn’t exist.
+
+        :param path: The path of the file on the target.
+        :param directories: Paths on the target, already quoted for the
+          shell, which must exist.
+        """
+        quoted = shlex.quote(path)
+        command = "{{ sha256sum {0} 2>/dev/null || shasum -a 256 {0}; }}".format(quoted)
+        if directories:
+            command = " && ".join(
+                ["test -e " + directory for directory in directories] + [command]
+            )
+        executed = self._low_level_execute_command(command)
+        if executed.get("rc") != 0:
+            return None
+        fields = executed.get("stdout", "").split()
+        if not fields:
+            return None
+        return fields[0]
+
+    @staticmethod
+    def _cache_path(host: str) -> str:
+        name = hashlib.sha256(host.encode()).hexdigest()[:32]
+        return os.path.join(CACHE_DIR, name + ".json")
+
+    def _read_cache(self, host: str) -> dict[str, str]:
+        """Read the digests of a host. A missing or corrupt cache file is
+        treated as empty.
+
+        :param host: The inventory host name.
+
+        :return: A dictionary: The key is the hash of the bookmark file
+          path and the arguments, the value the digest of the bookmark
+          file.
+        """
+        try:
+            with open(self._cache_path(host), "r") as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(content, dict):
+            return {}
+        return content
+
+    def _write_cache(self, host: str, key: str, digest: str) -> None:
+        """Store a digest. A cache file that can’t be written only means
+        that the next run executes the module.
+
+        :param host: The inventory host name.
+        :param key: The hash of the bookmark file path and the arguments.
+        :param digest: The digest of the bookmark file.
+        """
+        content = self._read_cache(host)
+        content[key] = digest
+        # The module isn’t importable on the controller, so its
+        # write_atomically() can’t be used here.
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".cache.")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(content, cache_file)
+            os.replace(tmp_path, self._cache_path(host))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,98 @@
+"""Helpers to generate synthetic sdirs files and to time operations of the
+:class:`shellmarks.ShellmarkManager`."""
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Sequence
+
+from shellmarks import ShellmarkManager
+
+
+def generate_lines(
+    size: int,
+    duplicate_ratio: float = 0.0,
+    seed: int = 0,
+    missing_ratio: float = 1.0,
+    existing_dirs: Sequence[str] = (),
+) -> list[str]:
+    """Generate the lines of a synthetic sdirs file.
+
+    :param size: The number of lines.
+    :param duplicate_ratio: The ratio of lines that repeat the mark of an
+      earlier line.
+    :param seed: The seed of the random number generator.
+    :param missing_ratio: The ratio of lines whose path doesn’t exist.
+      Only effective if `existing_dirs` is given.
+    :param existing_dirs: Existing directories, which are used in turn
+      for the paths that exist.
+    """
+    rand = random.Random(seed)
+    lines: list[str] = []
+    for i in range(size):
+        if i > 0 and rand.random() < duplicate_ratio:
+            mark = "mark{}".format(rand.randrange(i))
+        else:
+            mark = "mark{}".format(i)
+        if existing_dirs and rand.random() >= missing_ratio:
+            path = existing_dirs[i % len(existing_dirs)]
+        else:
+            path = "/tmp/shellmarks/dir{}".format(i)
+        lines.append('export DIR_{}="{}"\n'.format(mark, path))
+    return lines
+
+
+def generate_sdirs(
+    size: int,
+    duplicate_ratio: float = 0.0,
+    seed: int = 0,
+    missing_ratio: float = 1.0,
+    existing_dirs: Sequence[str] = (),
+) -> str:
+    """Write a synthetic sdirs file and return its path."""
+    path = tempfile.mkstemp(prefix="sdirs-")[1]
+    with open(path, "w") as sdirs:
+        sdirs.writelines(
+            generate_lines(size, duplicate_ratio, seed, missing_ratio, existing_dirs)
+        )
+    return path
+
+
+def create_directories(count: int) -> list[str]:
+    """Create empty directories in a new temporary directory."""
+    root = tempfile.mkdtemp(prefix="shellmarks-")
+    directories = [os.path.join(root, "dir{}".format(i)) for i in range(count)]
+    for directory in directories:
+        os.mkdir(directory)
+    return directories
+
+
+def load(path: str) -> ShellmarkManager:
+    return ShellmarkManager(path=path, validate_on_init=False)
+
+
+def measure(function: Callable[[], object]) -> float:
+    """Call the function once and return the elapsed wall time in
+    seconds."""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def sizes_from_argv(default: list[int]) -> list[int]:
+    """Read the file sizes (number of lines) from the command line."""
+    if len(sys.argv) > 1:
+        return [int(arg) for arg in sys.argv[1:]]
+    return default
+
+
+def report(name: str, size: int, seconds: float) -> None:
+    print(
+        "{:<20} {:>9} lines {:>10.4f} s {:>10.3f} µs/line".format(
+            name, size, seconds, seconds / max(size, 1) * 1e6
+        )
+    )
@@ -0,0 +1,19 @@
+"""Show that ShellmarkManager.delete_duplicates scales linearly.
+
+Usage: python -m benchmarks.delete_duplicates [SIZE ...]
+"""
+
+from __future__ import annotations
+
+from ._helper import generate_sdirs, load, measure, report, sizes_from_argv
+
+
+def main() -> None:
+    for size in sizes_from_argv([10_000, 100_000, 1_000_000]):
+        manager = load(generate_sdirs(size, duplicate_ratio=0.3))
+        seconds = measure(lambda: manager.delete_duplicates(marks=True, paths=True))
+        report("delete_duplicates", size, seconds)
+
+
+if __name__ == "__main__":
+    main()
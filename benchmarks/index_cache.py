@@ -0,0 +1,33 @@
+"""Compare a cold load, which parses the text file and writes the index
+cache, with a warm load from a valid index cache.
+
+Usage: python -m benchmarks.index_cache [SIZE ...]
+"""
+
+from __future__ import annotations
+
+import os
+
+from shellmarks import ShellmarkManager
+
+from ._helper import generate_sdirs, measure, report, sizes_from_argv
+
+
+def main() -> None:
+    for size in sizes_from_argv([10_000, 100_000, 1_000_000]):
+        path = generate_sdirs(size)
+        index_path = path + ".idx"
+
+        def load() -> ShellmarkManager:
+            return ShellmarkManager(
+                path=path, validate_on_init=False, index_path=index_path
+            )
+
+        report("load (cold)", size, measure(load))
+        report("load (warm)", size, measure(load))
+        os.remove(index_path)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Measure the load throughput of ShellmarkManager in lines per second.
+
+Usage: python -m benchmarks.load [SIZE ...]
+"""
+
+from __future__ import annotations
+
+from ._helper import generate_sdirs, load, measure, sizes_from_argv
+
+
+def main() -> None:
+    for size in sizes_from_argv([10_000, 100_000, 1_000_000]):
+        path = generate_sdirs(size)
+        seconds = measure(lambda: load(path))
+        print(
+            "{:<20} {:>9} lines {:>10.4f} s {:>12.0f} lines/s".format(
+                "load", size, seconds, size / seconds
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Measure the memory usage per bookmark of a loaded ShellmarkManager with
+tracemalloc, loaded from the text file and from the index cache.
+
+Usage: python -m benchmarks.memory [SIZE ...]
+"""
+
+from __future__ import annotations
+
+import os
+import tracemalloc
+
+from shellmarks import ShellmarkManager
+
+from ._helper import generate_sdirs, sizes_from_argv
+
+
+def main() -> None:
+    for size in sizes_from_argv([100_000, 1_000_000]):
+        path = generate_sdirs(size)
+        index_path = path + ".idx"
+        # Write the index cache.
+        ShellmarkManager(path=path, validate_on_init=False, index_path=index_path)
+        for name, index in (("text", None), ("index", index_path)):
+            tracemalloc.start()
+            manager = ShellmarkManager(
+                path=path, validate_on_init=False, index_path=index
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                "{:<8} {:>9} lines {:>8.1f} bytes/bookmark {:>8.1f} peak".format(
+                    name, size, current / size, peak / size
+                )
+            )
+            del manager
+        os.remove(index_path)
+
+
+if __name__ == "__main__":
+    main()
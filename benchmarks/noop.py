@@ -0,0 +1,71 @@
+"""Measure a module run which leaves the bookmark file unchanged (the
+bookmark is already present), with and without the raw content check
+:func:`shellmarks.is_already_present`.
+
+Usage: python -m benchmarks.noop [SIZE ...]
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from unittest import mock
+
+import shellmarks
+
+from ._helper import generate_lines, measure, report, sizes_from_argv
+
+
+def run_main(params: dict[str, object]) -> None:
+    with mock.patch("ansible.module_utils.basic.AnsibleModule") as AnsibleModule:
+        module = AnsibleModule.return_value
+        module.params = dict(params)
+        module.check_mode = False
+        shellmarks.main()
+    module.exit_json.assert_called_with(changed=False)
+
+
+def main() -> None:
+    directory = tempfile.mkdtemp()
+    for size in sizes_from_argv([100, 10_000, 100_000]):
+        lines = generate_lines(size - 1)
+        lines.append('export DIR_present="{}"\n'.format(directory))
+        lines.sort(key=lambda line: line.split("=")[0])
+        path = tempfile.mkstemp(prefix="sdirs-")[1]
+        with open(path, "w") as sdirs:
+            sdirs.writelines(lines)
+        params: dict[str, object] = {
+            "cleanup": False,
+            "cleanup_keep_timed_out": True,
+            "cleanup_timeout": None,
+            "cleanup_workers": 1,
+            "delete_duplicates": False,
+            "exclusive": False,
+            "export": None,
+            "export_batch_size": 100,
+            "export_check": None,
+            "export_ledger": False,
+            "export_list": None,
+            "export_workers": 1,
+            "index_cache": False,
+            "lock_timeout": 10.0,
+            "locking": "none",
+            "mark": "present",
+            "marks": None,
+            "path": directory,
+            "profile": False,
+            "profile_output": None,
+            "replace_home": False,
+            "sdirs": path,
+            "sorted": True,
+            "state": "present",
+        }
+        report("no-op (raw check)", size, measure(lambda: run_main(params)))
+        with mock.patch("shellmarks.is_already_present", return_value=False):
+            report("no-op (full run)", size, measure(lambda: run_main(params)))
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
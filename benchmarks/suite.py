@@ -0,0 +1,256 @@
+"""Measure the time and the peak memory of the core operations of
+:class:`shellmarks.ShellmarkManager` on synthetic sdirs files of
+different sizes, duplicate ratios and ratios of missing paths.
+
+The time is the best of several runs, the peak memory is measured with
+tracemalloc in a separate run. Each run operates on a freshly loaded
+manager.
+
+With --baseline the results are compared with a stored baseline. The
+exit status is 1 if an operation is slower or needs more memory than the
+baseline plus the threshold. Create or update the baseline on the
+machine that runs the comparison:
+
+    python -m benchmarks.suite --output benchmarks/baseline.json
+
+Usage: python -m benchmarks.suite [--sizes SIZE ...] [--baseline FILE]
+    [--output FILE] [--threshold RATIO] [--memory-threshold RATIO]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from shellmarks import ShellmarkManager
+
+from ._helper import create_directories, generate_sdirs
+
+SCENARIOS: list[tuple[float, float]] = [(0.0, 0.0), (0.2, 0.2)]
+"""The combinations of the duplicate ratio and the missing path ratio."""
+
+MIN_SECONDS = 0.002
+"""Differences of timings below this number of seconds are ignored."""
+
+
+def add_entry(manager: ShellmarkManager) -> None:
+    manager.add_entry(
+        mark="benchmark",
+        path=os.path.dirname(manager.path),
+        avoid_duplicate_marks=True,
+        avoid_duplicate_paths=True,
+        delete_old_entries=True,
+        silent=False,
+    )
+
+
+def delete_one(manager: ShellmarkManager) -> None:
+    manager.delete_entries(mark="mark1")
+
+
+def replace_home(manager: ShellmarkManager) -> None:
+    manager.replace_home = True
+
+
+def changed(manager: ShellmarkManager) -> None:
+    manager.changed
+
+
+def write(manager: ShellmarkManager) -> None:
+    manager.write(manager.path + ".out")
+
+
+OPERATIONS: dict[
+    str,
+    tuple[
+        Optional[Callable[[ShellmarkManager], None]],
+        Callable[[ShellmarkManager], None],
+    ],
+] = {
+    # name: (setup, operation)
+    "add_entry": (None, add_entry),
+    "delete_entries": (None, delete_one),
+    "delete_duplicates": (None, lambda manager: manager.delete_duplicates()),
+    "cleanup": (None, lambda manager: manager.cleanup()),
+    "sort": (None, lambda manager: manager.sort()),
+    # Same number of entries, so the rendered content is compared.
+    "changed": (replace_home, changed),
+    "write": (delete_one, write),
+}
+"""The measured operations. The setup function isn’t measured."""
+
+
+def load(path: str) -> ShellmarkManager:
+    return ShellmarkManager(path=path, validate_on_init=False)
+
+
+def measure_operation(
+    path: str,
+    setup: Optional[Callable[[ShellmarkManager], None]],
+    operation: Optional[Callable[[ShellmarkManager], None]],
+    repeat: int,
+) -> tuple[float, int]:
+    """Measure one operation. If the operation is None, the loading of
+    the file is measured.
+
+    :return: The best time in seconds and the peak memory in bytes.
+    """
+
+    def prepare() -> Optional[ShellmarkManager]:
+        if operation is None:
+            return None
+        manager = load(path)
+        if setup is not None:
+            setup(manager)
+        return manager
+
+    def run(manager: Optional[ShellmarkManager]) -> object:
+        if manager is None or operation is None:
+            return load(path)
+        return operation(manager)
+
+    best = float("inf")
+    for _ in range(repeat):
+        manager = prepare()
+        start = time.perf_counter()
+        run(manager)
+        best = min(best, time.perf_counter() - start)
+
+    manager = prepare()
+    tracemalloc.start()
+    result = run(manager)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+
+def run_suite(sizes: list[int], repeat: int) -> dict[str, dict[str, float]]:
+    """Run all operations on all sizes and scenarios.
+
+    :return: A dictionary: The key identifies the operation, the size and
+      the scenario, the value is a dictionary with the keys seconds and
+      peak (bytes).
+    """
+    existing_dirs = create_directories(100)
+    results: dict[str, dict[str, float]] = {}
+    for size in sizes:
+        for duplicate_ratio, missing_ratio in SCENARIOS:
+            path = generate_sdirs(
+                size,
+                duplicate_ratio=duplicate_ratio,
+                missing_ratio=missing_ratio,
+                existing_dirs=existing_dirs,
+            )
+            runs = repeat if size <= 100_000 else 1
+            operations: list[
+                tuple[
+                    str,
+                    Optional[Callable[[ShellmarkManager], None]],
+                    Optional[Callable[[ShellmarkManager], None]],
+                ]
+            ] = [("load", None, None)]
+            operations += [
+                (name, setup, operation)
+                for name, (setup, operation) in OPERATIONS.items()
+            ]
+            for name, setup, operation in operations:
+                seconds, peak = measure_operation(path, setup, operation, runs)
+                key = "{} size={} duplicates={} missing={}".format(
+                    name, size, duplicate_ratio, missing_ratio
+                )
+                results[key] = {"seconds": seconds, "peak": peak}
+                print(
+                    "{:<58} {:>10.4f} s {:>10.0f} KiB".format(
+                        key, seconds, peak / 1024
+                    ),
+                    flush=True,
+                )
+            for leftover in (path, path + ".out"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+    memory_threshold: float,
+) -> list[str]:
+    """Compare the results with a baseline.
+
+    :return: A list of regressions. Keys missing in the baseline are
+      skipped.
+    """
+    regressions: list[str] = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        if result["seconds"] > base["seconds"] * (1 + threshold) + MIN_SECONDS:
+            regressions.append(
+                "{}: {:.4f} s instead of {:.4f} s".format(
+                    key, result["seconds"], base["seconds"]
+                )
+            )
+        if result["peak"] > base["peak"] * (1 + memory_threshold) + 64 * 1024:
+            regressions.append(
+                "{}: {:.0f} KiB instead of {:.0f} KiB".format(
+                    key, result["peak"] / 1024, base["peak"] / 1024
+                )
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="A JSON file with stored results.")
+    parser.add_argument("--output", help="Store the results in a JSON file.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.0,
+        help="The allowed relative slowdown (1.0 means twice as slow).",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.2,
+        help="The allowed relative increase of the peak memory.",
+    )
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.repeat)
+
+    if args.output:
+        directory = os.path.dirname(os.path.abspath(args.output))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".baseline.")
+        with os.fdopen(fd, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write("\n")
+        os.replace(tmp_path, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,14 +18,71 @@
 
 from __future__ import annotations
 
+import bisect
+import contextlib
+import fcntl
+import functools
+import gc
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import marshal
 import os
 import pwd
 import re
 import shlex
+import struct
 import subprocess
-from typing import List, Literal, Optional, TypedDict, cast
-
-from ansible.module_utils.basic import AnsibleModule
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    TypedDict,
+    TypeVar,
+    Union,
+    cast,
+)
+
+if TYPE_CHECKING:
+    # Imported in main(), the classes Entry and ShellmarkManager and the
+    # command line interface don’t need Ansible.
+    from ansible.module_utils.basic import AnsibleModule
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+ENTRY_REGEX = re.compile(r'export DIR_(.*)="(.*)"')
+"""The pattern of one line in the file `~/.sdirs`."""
+
+MARK_REGEX = re.compile(r"[0-9a-zA-Z_]+")
+"""The allowed characters of a bookmark name."""
+
+CANONICAL_SDIRS_REGEX = re.compile(rb'(?:export DIR_[0-9a-zA-Z_]+="[^"\n]*"\n)*')
+"""The pattern of a whole bookmark file without blank lines, in which
+every line is terminated by a newline."""
+
+OPTIMISTIC_ATTEMPTS = 10
+"""The maximum number of times the bookmark operations are applied in
+the optimistic locking mode before the module gives up."""
+
+INDEX_MAGIC = b"SDIRSIDX"
+"""The first bytes of an index cache file."""
+
+INDEX_HEADER = struct.Struct("<8sIQQq32s")
+"""The header of an index cache file: the magic bytes, the marshal
+format version and the inode, size, modification time (ns) and SHA-256
+digest of the bookmark file the index was built from."""
 
 ANSIBLE_METADATA = {
     "metadata_version": "1.0",
@@ -52,6 +109,30 @@ options:
             - Delete bookmarks of nonexistent directories.
         required: false
         default: false
+    cleanup_keep_timed_out:
+        description:
+            - Keep the bookmarks whose existence check didn't finish
+              within cleanup_timeout. If false, these bookmarks are
+              deleted.
+        required: false
+        type: bool
+        default: true
+    cleanup_timeout:
+        description:
+            - The maximum number of seconds to wait for the existence
+              check of a single path, for example a path on a hung NFS
+              mount. By default there is no limit. Once a check timed
+              out, all other bookmarks below the same parent directory
+              are treated as timed out without checking them.
+        required: false
+        type: float
+    cleanup_workers:
+        description:
+            - The number of paths that are checked concurrently on
+              cleanup.
+        required: false
+        type: int
+        default: 1
     delete_duplicates:
         description:
             - Delete duplicate bookmark entries. This option deletes both
@@ -59,6 +140,19 @@ options:
               beginning are deleted, entries at the end are perserved.
         required: false
         default: false
+    exclusive:
+        description:
+            - Treat the bookmarks of the options mark, path and marks as
+              the complete list of bookmarks. Bookmarks with other marks
+              and duplicate marks are deleted, bookmarks with a
+              different path are updated and missing bookmarks are
+              added. Every bookmark with the state present needs a
+              path, bookmarks with the state absent are ignored. All
+              differences are reported as a single change with the
+              action reconcile and the lists added, removed and updated.
+        required: false
+        type: bool
+        default: false
     export:
         description:
             - Command line string to export the bookmarks. The string
@@ -66,29 +160,149 @@ options:
               the path. For example 'autojump --add %path' or 'zoxide add
               %path'.
         required: false
+    export_ledger:
+        description:
+            - Remember the successfully exported bookmarks in a ledger
+              file next to the bookmark file (for example
+              ~/.sdirs.export). Only bookmarks that are new or changed
+              since the last export are exported. If the bookmark file
+              didn't change since the last complete export, the export
+              is skipped entirely.
+        required: false
+        type: bool
+        default: false
+    export_list:
+        description:
+            - Command line string that lists the already exported paths,
+              one path per line. The command is executed only once.
+              Entries whose path is listed are not exported again. If
+              the command fails, only export_check is used. For example
+              'zoxide query --list'.
+        required: false
+    export_workers:
+        description:
+            - The maximum number of export commands (including the
+              export_check commands) that are executed concurrently.
+              The order of the reported export commands is the order of
+              the entries.
+        required: false
+        type: int
+        default: 1
+    export_batch_size:
+        description:
+            - The maximum number of paths the placeholder %paths in the
+              export command is replaced with. If the export command
+              contains the placeholder %paths, the paths of all entries
+              are exported in chunks, one command per chunk. The chunks
+              are also split to stay below the argument size limit of the
+              operating system (ARG_MAX). For example 'zoxide add %paths'.
+        required: false
+        type: int
+        default: 100
     export_check:
         description:
             - Command line string to query if the bookmark is already exported.
               The string %mark is replaced with the mark and %path is replaced
               with the path. For example 'zoxide query %path'.
         required: false
+    lock_timeout:
+        description:
+            - The maximum number of seconds to wait for the lock of the
+              bookmark file.
+        required: false
+        type: float
+        default: 10
+    locking:
+        description:
+            - How concurrent updates of the bookmark file by other
+              processes are handled. C(exclusive) holds an advisory lock
+              (flock) on a lock file next to the bookmark file (for
+              example ~/.sdirs.lock) from loading to writing.
+              C(optimistic) loads and modifies the bookmarks without the
+              lock. If the bookmark file was changed in the meantime, the
+              bookmark operations are applied again to the fresh content
+              instead of overwriting it. The lock is only held for the
+              final check and the write. C(none) disables locking.
+              Nothing is locked in check mode.
+        required: false
+        default: none
+        choices:
+            - exclusive
+            - optimistic
+            - none
     mark:
         description:
             - Name of the bookmark.
         required: false
         aliases:
             - bookmark
+    marks:
+        description:
+            - A list of bookmarks to apply in a single module invocation.
+              The bookmark file is loaded, sorted and written only once
+              for the whole list. The list is applied after the
+              bookmark specified by the options mark, path and state.
+        required: false
+        type: list
+        elements: dict
+        suboptions:
+            mark:
+                description:
+                    - Name of the bookmark.
+                required: true
+                aliases:
+                    - bookmark
+            path:
+                description:
+                    - Full path to the directory.
+                required: false
+                aliases:
+                    - src
+            state:
+                description:
+                    - State of the mark.
+                required: false
+                default: present
+                choices:
+                    - present
+                    - absent
     path:
         description:
             - Full path to the directory.
         required: false
         aliases:
             - src
+    profile:
+        description:
+            - Record the wall time and the number of calls of the phases
+              of the module run (already_present, load, marks, cleanup,
+              delete_duplicates, sort, changed, write and export) and
+              return them as timings.
+        required: false
+        type: bool
+        default: false
+    profile_output:
+        description:
+            - Profile the module run with cProfile and write the
+              statistics to this file on the managed host. The file can
+              be analyzed with the pstats module or a tool like
+              snakeviz.
+        required: false
     replace_home:
         description:
             - Replace home directory with $HOME variable.
         required: false
         default: true
+    index_cache:
+        description:
+            - Store the parsed bookmarks in a binary cache file next to
+              the bookmark file (for example ~/.sdirs.idx). The cache is
+              only used if the inode, size, modification time and
+              content of the bookmark file match, otherwise it is
+              rebuilt. The cache isn't written in check mode.
+        required: false
+        type: bool
+        default: false
     sdirs:
         description:
             - The path to the file where the bookmarks are stored.
@@ -128,6 +342,30 @@ changes:
         reverse: false
       - action: cleanup
         count: 1
+      - action: cleanup
+        count: 0
+        timed_out:
+          - /mnt/nfs/dir1
+        timed_out_kept: true
+timed_out:
+    description: The paths whose existence check on cleanup timed out,
+      see cleanup_timeout.
+    returned: If a check timed out
+    type: list
+    sample:
+      - /mnt/nfs/dir1
+timings:
+    description: The wall time in seconds and the number of calls per
+      phase. Phases that were not run are missing.
+    returned: If profile is true
+    type: dict
+    sample:
+      load:
+        seconds: 0.0012
+        calls: 1
+      marks:
+        seconds: 0.0003
+        calls: 2
 """
 
 EXAMPLES = """
@@ -151,6 +389,14 @@ EXAMPLES = """
 - shellmarks:
     sorted: true
 
+# Apply several bookmarks at once
+- shellmarks:
+    marks:
+      - mark: ansible
+        path: /etc/ansible
+      - mark: tmp
+        state: absent
+
 # Delete bookmarks of no longer existing directories
 - shellmarks:
     cleanup: true
@@ -169,6 +415,375 @@ class NoPathError(ShellmarksError):
     """Raised when the path to bookmark is non-existent."""
 
 
+class SdirsSyntaxError(ShellmarksError):
+    """Raised when lines of the bookmark file can’t be parsed."""
+
+
+class LockTimeoutError(ShellmarksError):
+    """Raised when the lock of the bookmark file can’t be acquired in
+    time."""
+
+
+def parse_sdirs(lines: Iterable[str]) -> list[tuple[str, str]]:
+    """Parse all lines of a bookmark file in one pass. Blank lines are
+    skipped.
+
+    :param lines: The lines of the file `~/.sdirs`.
+
+    :return: A list of (mark, path) tuples.
+
+    :raises SdirsSyntaxError: If lines can’t be parsed. The message lists
+      the line numbers (starting from 1).
+    """
+    search = ENTRY_REGEX.search
+    result: list[tuple[str, str]] = []
+    malformed: list[str] = []
+    for line_number, line in enumerate(lines, start=1):
+        match = search(line)
+        if match is not None:
+            result.append((match.group(1), match.group(2)))
+        elif line.strip():
+            malformed.append(str(line_number))
+    if malformed:
+        raise SdirsSyntaxError(
+            "Malformed lines in the bookmark file: {}.".format(", ".join(malformed))
+        )
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_home_dir() -> str:
+    """The home directory of the current user. The passwd database is
+    queried only once per process (a lookup can be a network round trip on
+    LDAP / SSSD backed hosts)."""
+    return pwd.getpwuid(os.getuid()).pw_dir
+
+
+def write_atomically(
+    path: str,
+    content: bytes,
+    ignore_errors: bool = False,
+    stat: Optional[os.stat_result] = None,
+) -> bool:
+    """Write a file atomically: The content is written to a temporary file
+    in the same directory, which then replaces the target. Readers see
+    either the old or the new content, never a partially written file.
+
+    :param path: The path of the target file.
+    :param content: The new content.
+    :param ignore_errors: Return False instead of raising an
+      :class:`OSError`, for files which only speed up later runs.
+    :param stat: The stat result of the existing target. Its mode and
+      ownership are preserved. Without it, the mode is derived from the
+      umask like for a newly created file.
+
+    :return: False if an error was ignored.
+    """
+    directory, name = os.path.split(path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix="." + name + ".")
+    except OSError:
+        if ignore_errors:
+            return False
+        raise
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        if stat is not None:
+            os.chmod(tmp_path, stat.st_mode & 0o7777)
+            try:
+                os.chown(tmp_path, stat.st_uid, stat.st_gid)
+            except PermissionError:
+                pass
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException as exception:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        if ignore_errors and isinstance(exception, OSError):
+            return False
+        raise
+    return True
+
+
+class PathExistenceCache:
+    """A run-scoped cache of path existence. The entries of the parent
+    directory of a path are read with one :func:`os.scandir` call, so the
+    existence of all paths in the same directory is resolved with a
+    single system call instead of one `stat` call per path.
+
+    Only listed names are trusted. Some existing paths aren’t listed by
+    their parent directory, for example autofs mount points with browsing
+    disabled or names with a different case on case-insensitive
+    filesystems, so names that aren’t listed are checked with
+    :func:`os.path.exists`."""
+
+    _directories: dict[str, Optional[set[str]]]
+    """The key is the directory, the value the names of the existing
+    entries or None if the directory couldn’t be read."""
+
+    _missing: set[str]
+    """Directories that don’t exist or whose path is invalid."""
+
+    def __init__(self) -> None:
+        self._directories = {}
+        self._missing = set()
+
+    @staticmethod
+    def _scan(directory: str) -> Optional[set[str]]:
+        names: set[str] = set()
+        try:
+            with os.scandir(directory) as iterator:
+                for dir_entry in iterator:
+                    # os.path.exists() follows symbolic links.
+                    if not dir_entry.is_symlink() or os.path.exists(dir_entry.path):
+                        names.add(dir_entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            # Handled by exists(): no path in the directory exists.
+            raise
+        except OSError:
+            return None
+        return names
+
+    def exists(self, path: str) -> bool:
+        """Check if the path exists. A drop-in replacement for
+        :func:`os.path.exists`.
+
+        :param path: The path to check.
+        """
+        directory, name = os.path.split(path)
+        if not name or name in (".", ".."):
+            return os.path.exists(path)
+        if not directory:
+            directory = "."
+        if directory in self._missing:
+            return False
+        if directory not in self._directories:
+            try:
+                self._directories[directory] = self._scan(directory)
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                # ValueError: embedded null byte
+                self._missing.add(directory)
+                return False
+        names = self._directories[directory]
+        if names is not None and name in names:
+            return True
+        return os.path.exists(path)
+
+
+class FileLock:
+    """An advisory lock (:func:`fcntl.flock`) on a lock file next to the
+    bookmark file. The bookmark file itself can’t be locked, because it is
+    atomically replaced on every write.
+
+    :param path: The path of the lock file. It is created if it doesn’t
+      exist and never deleted.
+    :param timeout: The maximum number of seconds to wait for the lock.
+      None means no limit.
+    """
+
+    path: str
+
+    timeout: Optional[float]
+
+    _fd: Optional[int]
+
+    def __init__(self, path: str, timeout: Optional[float] = None) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+
+    def __enter__(self) -> FileLock:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockTimeoutError(
+                        "The lock “{}” couldn’t be acquired within {} seconds.".format(
+                            self.path, self.timeout
+                        )
+                    )
+                time.sleep(0.05)
+        self._fd = fd
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class PhaseTimer:
+    """Record the wall time and the number of calls of named phases.
+
+    :param enabled: If false, nothing is recorded.
+    """
+
+    enabled: bool
+
+    timings: dict[str, dict[str, float | int]]
+    """The key is the name of the phase, the value a dictionary with the
+    keys `seconds` and `calls`."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """A context manager to measure one call of a phase.
+
+        :param name: The name of the phase.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.timings.setdefault(name, {"seconds": 0.0, "calls": 0})
+            timing["seconds"] += time.perf_counter() - start
+            timing["calls"] += 1
+
+
+def check_paths(
+    paths: list[str],
+    workers: int = 1,
+    timeout: Optional[float] = None,
+    exists: Optional[Callable[[str], bool]] = None,
+) -> dict[str, Optional[bool]]:
+    """Check the existence of many paths concurrently. Each check is
+    bounded by a deadline: A worker whose check doesn’t return in time
+    (for example on a hung NFS mount) is abandoned and replaced by a new
+    worker. The parent directory of a timed out path is considered hung:
+    All other paths below it time out immediately without a check, so a
+    hung mount costs one timeout and one abandoned worker.
+
+    :param paths: The paths to check.
+    :param workers: The number of paths that are checked concurrently.
+    :param timeout: The maximum number of seconds for the check of one
+      path. None means no limit.
+    :param exists: The function to check the existence of one path.
+      Defaults to :func:`os.path.exists`.
+
+    :return: A dictionary: The key is the path and the value is True if
+      the path exists, False if it doesn’t exist or can’t be checked (like
+      :func:`os.path.exists`) and None if the check timed out.
+    """
+    exists_function = os.path.exists if exists is None else exists
+
+    def check(path: str) -> bool:
+        try:
+            return exists_function(path)
+        except (OSError, ValueError):
+            return False
+
+    results: dict[str, Optional[bool]] = {}
+    if timeout is None and workers <= 1:
+        for path in paths:
+            if path not in results:
+                results[path] = check(path)
+        return results
+
+    pending = deque(dict.fromkeys(paths))
+    # The path and the start time of the check of each running worker.
+    running: dict[int, tuple[str, float]] = {}
+    abandoned: set[int] = set()
+    # The parent directories of the timed out paths.
+    hung: set[str] = set()
+    # Unexpected exceptions of the workers, re-raised in the caller.
+    errors: list[BaseException] = []
+    condition = threading.Condition()
+
+    def is_hung(path: str) -> bool:
+        while path not in hung:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+        return True
+
+    def skip_hung() -> None:
+        for path in [path for path in pending if is_hung(path)]:
+            results[path] = None
+            pending.remove(path)
+
+    def work(worker_id: int) -> None:
+        while True:
+            with condition:
+                while pending and is_hung(pending[0]):
+                    results[pending.popleft()] = None
+                if not pending or worker_id in abandoned:
+                    condition.notify()
+                    return
+                path = pending.popleft()
+                running[worker_id] = (path, time.monotonic())
+            try:
+                path_exists = check(path)
+            except BaseException as exception:
+                with condition:
+                    errors.append(exception)
+                    pending.clear()
+                    running.pop(worker_id, None)
+                    condition.notify()
+                return
+            with condition:
+                if worker_id in abandoned:
+                    return
+                results[path] = path_exists
+                del running[worker_id]
+                condition.notify()
+
+    def start(worker_id: int) -> None:
+        # Daemon threads: A hung worker must not block the exit.
+        threading.Thread(target=work, args=(worker_id,), daemon=True).start()
+
+    worker_count = max(min(workers, len(pending)), 1)
+    with condition:
+        for worker_id in range(worker_count):
+            start(worker_id)
+        while pending or running:
+            wait: Optional[float] = None
+            if timeout is not None:
+                now = time.monotonic()
+                for path, started in running.values():
+                    if now - started >= timeout:
+                        hung.add(os.path.dirname(path))
+                replaced = 0
+                for worker_id, (path, started) in list(running.items()):
+                    if is_hung(path):
+                        results[path] = None
+                        abandoned.add(worker_id)
+                        del running[worker_id]
+                        replaced += 1
+                    else:
+                        remaining = started + timeout - now
+                        wait = remaining if wait is None else min(wait, remaining)
+                skip_hung()
+                for _ in range(min(replaced, len(pending))):
+                    start(worker_count)
+                    worker_count += 1
+            if pending or running:
+                condition.wait(wait if wait is not None else 1.0)
+    if errors:
+        raise errors[0]
+    return results
+
+
 class Entry:
     """A object representation of one line in the `~/.sdirs` file.
 
@@ -178,6 +793,10 @@ class Entry:
       (export DIR_dir1="/dir1").
     :param validate: Validate the input. Raise some exceptions if
       the bookmark strings are invalid or if the paths don’t exist.
+    :param exists: The function to check the existence of a path, for
+      example :meth:`PathExistenceCache.exists`.
+    :param home_dir: The path of the home directory. Defaults to
+      :func:`get_home_dir`.
 
     :raises ValueError: If not all necessary class arguments are specified.
     :raises MarkInvalidError: If `validate=True` and the given mark contains
@@ -185,6 +804,9 @@ class Entry:
     :raises NoPathError: If `validate=True` and the given path doesn’t exist.
     """
 
+    # No per instance __dict__: A manager holds many entries.
+    __slots__ = ("mark", "path", "_home_dir")
+
     mark: str
     """The name of the bookmark."""
 
@@ -192,10 +814,17 @@ class Entry:
     """The path which should be bookmark."""
 
     _home_dir: str
-    """The path of the home directory."""
+    """The path of the home directory. A reference to the string shared by
+    all entries of a manager."""
 
     def __init__(
-        self, path: str = "", mark: str = "", entry: str = "", validate: bool = True
+        self,
+        path: str = "",
+        mark: str = "",
+        entry: str = "",
+        validate: bool = True,
+        exists: Optional[Callable[[str], bool]] = None,
+        home_dir: Optional[str] = None,
     ) -> None:
         self.mark = ""
 
@@ -223,11 +852,14 @@ class Entry:
             )
             raise MarkInvalidError(message.format(self.mark))
 
-        self._home_dir = pwd.getpwuid(os.getuid()).pw_dir
+        if exists is None:
+            exists = os.path.exists
+
+        self._home_dir = home_dir if home_dir is not None else get_home_dir()
 
-        self.path = self.normalize_path(self.path, self._home_dir)
+        self.path = self.normalize_path(self.path, self._home_dir, exists)
 
-        if validate and not os.path.exists(self.path):
+        if validate and not exists(self.path):
             raise NoPathError("The path “{}” doesn’t exist.".format(self.path))
 
     @staticmethod
@@ -239,8 +871,13 @@ class Entry:
 
         :return: A match tuple
         :rtype: tuple
+
+        :raises SdirsSyntaxError: If the line can’t be parsed.
         """
-        return re.findall(r'export DIR_(.*)="(.*)"', entry)[0]
+        match = ENTRY_REGEX.search(entry)
+        if match is None:
+            raise SdirsSyntaxError("Malformed entry line: “{}”.".format(entry))
+        return match.groups()
 
     @staticmethod
     def check_mark(mark: str) -> bool:
@@ -252,29 +889,32 @@ class Entry:
         :return: True if the bookmark contains no invalid characters, false
           otherwise.
         :rtype: boolean"""
-        regex = re.compile(r"^[0-9a-zA-Z_]+$")
-        match = regex.match(str(mark))
-        if match:
-            return match.group(0) == mark
-        return False
+        return MARK_REGEX.fullmatch(str(mark)) is not None
 
     @staticmethod
-    def normalize_path(path: str, home_dir: str) -> str:
+    def normalize_path(
+        path: str, home_dir: str, exists: Optional[Callable[[str], bool]] = None
+    ) -> str:
         """Replace ~ and $HOME with a the actual path string. Replace trailing
         slashes. Convert to a absolute path.
 
         :param string path: The path of the bookmark / shellmark.
         :param string home_dir: The path of the home directory.
+        :param exists: The function to check the existence of a path.
+          Defaults to :func:`os.path.exists`.
 
         :return: A normalized path string.
         :rtype: string
         """
+        if exists is None:
+            exists = os.path.exists
         if path:
-            path = re.sub(r"(.+)/?$", r"\1", path)
-            path = re.sub(r"^~", home_dir, path)
-            path = re.sub(r"^\$HOME", home_dir, path)
+            if path.startswith("~"):
+                path = home_dir + path[1:]
+            if path.startswith("$HOME"):
+                path = home_dir + path[5:]
             # Only existing paths should converted to absolute paths.
-            if os.path.exists(path):
+            if exists(path):
                 path = os.path.abspath(path)
             return path
         return ""
@@ -299,11 +939,24 @@ class Entry:
         :return: The export string (export ...)
         :rtype: string
         """
+        return self.render(self.mark, self.path, self._home_dir, replace_home)
+
+    @staticmethod
+    def render(mark: str, path: str, home_dir: str, replace_home: bool = False) -> str:
+        """Assemble a mark and a path to an entry line
+        (export DIR_mark="path").
+
+        :param mark: The name of the bookmark / shellmark.
+        :param path: The normalized path of the bookmark / shellmark.
+        :param home_dir: The path of the home directory.
+        :param replace_home: Replace the home directory with the
+          environment variable $HOME.
+
+        :return: The export string (export ...)
+        """
         if replace_home:
-            path = self.path.replace(self._home_dir, "$HOME")
-        else:
-            path = self.path
-        return 'export DIR_{}="{}"'.format(self.mark, path)
+            path = path.replace(home_dir, "$HOME")
+        return 'export DIR_{}="{}"'.format(mark, path)
 
     def __expand_command(self, command: str) -> list[str]:
         args: list[str] = shlex.split(command)
@@ -323,6 +976,11 @@ class Entry:
         return None
 
 
+StoredEntry = Union[Entry, tuple[str, str]]
+"""An entry object or, for not yet materialized entries loaded without
+validation, a tuple of the mark and the normalized path."""
+
+
 class ShellmarkManager:
     """A class to store, add, get, update and delete shellmark entries.
 
@@ -331,95 +989,324 @@ class ShellmarkManager:
 
     :param boolean validate_on_init: Validate the attributes `mark` and
       `path` on object initialisation.
+
+    :param home_dir: The path of the home directory. Defaults to
+      :func:`get_home_dir`.
+
+    :param index_path: The path of a binary cache file of the parsed
+      entries and the index (for example `~/.sdirs.idx`). A cache which
+      matches the inode, size, modification time and content of the
+      file is loaded without parsing, an outdated cache is rebuilt. Only
+      effective if `validate_on_init` is false.
+
+    :raises SdirsSyntaxError: If lines of the file can’t be parsed.
     """
 
     path: str
     """The path of the .sdirs file."""
 
-    entries: list[Entry]
-    """A list of shellmark entries. """
+    home_dir: str
+    """The path of the home directory. It is passed to all entries."""
+
+    index_path: Optional[str]
+    """The path of the binary index cache file or None."""
+
+    _entries: dict[int, StoredEntry]
+    """The shellmark entries keyed by a stable entry ID. The insertion
+    order of the dictionary is the order of the entries in the file."""
+
+    _entries_list: Optional[list[Entry]]
+    """A cached list of the entries, invalidated on every mutation."""
+
+    _next_id: int
+    """The entry ID that is assigned to the next added entry."""
+
+    _path_cache: PathExistenceCache
+    """The existence cache shared by loading, validation and cleanup."""
 
     _index: dict[str, dict[str, list[int]]]
-    """A collection of dictionaries to hold the indexes (position of
-    the single entries in the list of entries).
+    """A collection of dictionaries to hold the indexes (the stable
+    entry IDs of the single entries). The index is updated in place on
+    every insertion, deletion and update.
 
     key: marks
 
     A dictonary: The key is the bookmark / shellmark name and the value is
-    a list of the corresponding index numbers.
+    a sorted list of the corresponding entry IDs.
 
     key: paths
 
-    A dictonary: The key is the path and the value is a list
-    the corresponding index numbers
+    A dictonary: The key is the path and the value is a sorted list
+    the corresponding entry IDs.
     """
 
     changes: list[dict[str, str | int | list[str]]]
     """A list of changes. Each change is a dictonary with the keys
     action, mark, path"""
 
-    _lines_original: list[str]
-    """The render lines of the origin sdirs file"""
+    _original_digest: str
+    """The SHA-256 digest of the content of the origin sdirs file."""
 
-    replace_home: bool
-    """Replace the home folder with the variable $HOME."""
+    _original_count: int
+    """The number of entries in the origin sdirs file."""
 
-    __export_commands: list[str]
+    _original_stat: Optional[tuple[int, int, int]]
+    """The inode, size and modification time (ns) of the origin sdirs
+    file."""
+
+    _append_only: bool
+    """True if entries were only appended since the file was loaded."""
+
+    _sorted_by: Optional[tuple[str, bool]]
+    """The attribute name and the reverse flag the entries are known to
+    be sorted by, or None if the order is unknown."""
+
+    _sorted_until: int
+    """All entries with an ID lower than this number are in the order of
+    `_sorted_by`. Entries appended later have higher IDs."""
+
+    _version: int
+    """A counter which is incremented by every mutation of the entries
+    and by every change of the attribute `replace_home`."""
+
+    _changed_cache: Optional[tuple[int, bool]]
+    """The version and the result of the last content comparison of the
+    property `changed`."""
 
-    _entries_original: list[Entry]
-    """A copy of the unmodified list entires generated by the object
-    initialisation."""
+    _replace_home: bool
 
-    def __init__(self, path: str, validate_on_init: bool = True) -> None:
+    __export_commands: list[str]
+
+    def __init__(
+        self,
+        path: str,
+        validate_on_init: bool = True,
+        home_dir: Optional[str] = None,
+        index_path: Optional[str] = None,
+    ) -> None:
         self.path = path
 
-        self.entries = []
+        self.index_path = index_path
 
-        self._index = {
-            "marks": {},
-            "paths": {},
-        }
+        self.home_dir = home_dir if home_dir is not None else get_home_dir()
+
+        self._path_cache = PathExistenceCache()
+
+        self._version = 0
+
+        self._changed_cache = None
+
+        self._clear()
 
         self.changes = []
 
-        self._lines_original = []
+        self._replace_home = False
 
-        self.replace_home = False
+        self._original_digest = hashlib.sha256().hexdigest()
 
-        if os.path.isfile(path):
-            sdirs = open(self.path, "r")
-            self._lines_original = sdirs.readlines()
-            sdirs.close()
+        self._original_stat = None
 
-        for line in self._lines_original:
-            self.add_entry(entry_line=line, validate=validate_on_init)
+        if os.path.isfile(path):
+            self._load(validate_on_init)
 
-        self._entries_original = list(self.entries)
+        self._original_count = len(self._entries)
+        self._append_only = True
         self.__export_commands = []
 
+    def _load(self, validate: bool) -> None:
+        """Read the whole file and create an entry object for each line.
+
+        Without validation, the entries are loaded from a valid index
+        cache. Otherwise a (mark, path) tuple is stored for each line whose
+        path can be normalized without accessing the file system. Only
+        these entries can be written to the index cache. Their entry
+        objects are created on demand."""
+        with open(self.path, "rb") as sdirs:
+            stat = os.fstat(sdirs.fileno())
+            content = sdirs.read()
+        self._original_stat = self._stat_identity(stat)
+        digest = hashlib.sha256(content).digest()
+        self._original_digest = digest.hex()
+        if not validate and self._read_index(stat, digest):
+            return
+        lines = (line.decode() for line in io.BytesIO(content))
+        for mark, path in parse_sdirs(lines):
+            normalized = None if validate else self._normalize_path_fast(path)
+            if normalized is None:
+                self._append_entry(
+                    Entry(
+                        mark=mark,
+                        path=path,
+                        validate=validate,
+                        exists=self._path_cache.exists,
+                        home_dir=self.home_dir,
+                    )
+                )
+            else:
+                self._append_entry((mark, normalized))
+        if not validate:
+            self._write_index(stat, digest)
+
+    def _read_index(self, stat: os.stat_result, digest: bytes) -> bool:
+        """Load the entries and the index from the index cache file.
+
+        :param stat: The stat result of the bookmark file.
+        :param digest: The SHA-256 digest of the bookmark file.
+
+        :return: False if there is no index cache file or if it doesn’t
+          match the bookmark file.
+        """
+        if self.index_path is None:
+            return False
+        try:
+            with open(self.index_path, "rb") as index:
+                header = index.read(INDEX_HEADER.size)
+                payload = index.read()
+            magic, version, *identity, index_digest = INDEX_HEADER.unpack(header)
+            if (
+                magic != INDEX_MAGIC
+                or version != marshal.version
+                or tuple(identity) != self._stat_identity(stat)
+                or index_digest != digest
+            ):
+                return False
+        except (OSError, struct.error):
+            return False
+        # Millions of small containers trigger many useless collections.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            home_dir, marks, paths, index_content = marshal.loads(payload)
+            if home_dir != self.home_dir:
+                return False
+            self._entries = dict(enumerate(zip(marks, paths)))
+        except (EOFError, ValueError, TypeError):
+            return False
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self._next_id = len(self._entries)
+        self._index = index_content
+        return True
+
+    def _write_index(self, stat: os.stat_result, digest: bytes) -> None:
+        """Write the entries and the index to the index cache file. No
+        cache is written if the path of an entry depends on the file
+        system. Write errors are ignored.
+
+        :param stat: The stat result of the bookmark file.
+        :param digest: The SHA-256 digest of the bookmark file.
+        """
+        if self.index_path is None:
+            return
+        marks: list[str] = []
+        paths: list[str] = []
+        for stored in self._entries.values():
+            if isinstance(stored, Entry):
+                return
+            marks.append(stored[0])
+            paths.append(stored[1])
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC, marshal.version, *self._stat_identity(stat), digest
+        )
+        payload = marshal.dumps((self.home_dir, marks, paths, self._index))
+        write_atomically(self.index_path, header + payload, ignore_errors=True)
+
+    def modified_since_load(self) -> bool:
+        """True if the bookmark file was modified, replaced, created or
+        deleted by another process since it was loaded. The inode, size
+        and modification time are compared."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._original_stat is not None
+        return self._stat_identity(stat) != self._original_stat
+
+    @staticmethod
+    def _stat_identity(stat: os.stat_result) -> tuple[int, int, int]:
+        """The inode, size and modification time (ns) of a file."""
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _normalize_path_fast(self, path: str) -> Optional[str]:
+        """Normalize a path without accessing the file system.
+
+        :return: The same path :meth:`Entry.normalize_path` returns or None
+          if the result depends on the existence of the path.
+        """
+        if path.startswith("~"):
+            path = self.home_dir + path[1:]
+        if path.startswith("$HOME"):
+            path = self.home_dir + path[5:]
+        # os.path.abspath() of an absolute path is os.path.normpath().
+        if path.startswith("/") and os.path.normpath(path) == path:
+            return path
+        return None
+
+    def _materialize(self, index: int) -> Entry:
+        """Get the entry object of an entry ID. A (mark, path) tuple is
+        replaced by an entry object."""
+        stored = self._entries[index]
+        if isinstance(stored, Entry):
+            return stored
+        entry = Entry(
+            mark=stored[0],
+            path=stored[1],
+            validate=False,
+            exists=self._path_cache.exists,
+            home_dir=self.home_dir,
+        )
+        self._entries[index] = entry
+        return entry
+
+    @staticmethod
+    def _mark_and_path(stored: StoredEntry) -> tuple[str, str]:
+        """The mark and the path of an entry object or a (mark, path) tuple."""
+        if isinstance(stored, Entry):
+            return stored.mark, stored.path
+        return stored
+
+    @property
+    def entries(self) -> list[Entry]:
+        """A list of shellmark entries in the order of the file."""
+        if self._entries_list is None:
+            self._entries_list = [self._materialize(index) for index in self._entries]
+        return self._entries_list
+
+    def _render_lines(self) -> Iterable[str]:
+        """Render the lines of the bookmark file without materializing the
+        entry objects."""
+        for stored in self._entries.values():
+            mark, path = self._mark_and_path(stored)
+            yield Entry.render(mark, path, self.home_dir, self.replace_home) + "\n"
+
+    @property
+    def replace_home(self) -> bool:
+        """Replace the home folder with the variable $HOME."""
+        return self._replace_home
+
+    @replace_home.setter
+    def replace_home(self, value: bool) -> None:
+        if value != self._replace_home:
+            self._replace_home = value
+            self._version += 1
+
     @property
     def changed(self) -> bool:
         """True if the shellmark entries are changed ofter the object
-        initialisation. It is not possible to use normal == comparison hence
-        the entry objects are regenerated by some actions (cleanup,
-        delete_duplicates).
+        initialisation. The mutations through the methods of this class are
+        tracked with a version counter: The rendered content is only
+        compared (by its digest) with the original file if the entries were
+        modified since the last comparison.
         """
         if len(self.__export_commands) > 0:
             return True
-        if len(self._entries_original) != len(self.entries):
-            return True
-
-        lines_new: list[str] = []
-
-        for entry in self.entries:
-            lines_new.append(
-                entry.to_export_string(replace_home=self.replace_home) + "\n"
-            )
-
-        if self._lines_original != lines_new:
+        if self._original_count != len(self._entries):
             return True
-
-        return False
+        if self._changed_cache is not None and self._changed_cache[0] == self._version:
+            return self._changed_cache[1]
+        changed = self._digest() != self._original_digest
+        self._changed_cache = (self._version, changed)
+        return changed
 
     @staticmethod
     def _list_intersection(list1: List[int], list2: List[int]) -> List[int]:
@@ -438,13 +1325,12 @@ class ShellmarkManager:
         return intersection
 
     def _store_index_number(self, attribute_name: str, value: str, index: int) -> None:
-        """Add the index number of an entry to the index store.
+        """Add the ID of an entry to the index store.
 
         :param attribute_name: `mark` or `path`
         :param value: The value of the attribute name. For example
           `$HOME/Downloads` for `path` and `downloads` for `mark`
-        :param index: The index number of the entry in the list of
-          entries.
+        :param index: The stable ID of the entry.
 
         :raises ValueError: If `attribute_name` is not `mark` or `path`.
         """
@@ -453,22 +1339,91 @@ class ShellmarkManager:
         attribute_index_name = attribute_name + "s"
         if value not in self._index[attribute_index_name]:
             self._index[attribute_index_name][value] = [index]
-        elif index not in self._index[attribute_index_name][value]:
-            self._index[attribute_index_name][value].append(index)
-            self._index[attribute_index_name][value].sort()
+            return
+        indexes = self._index[attribute_index_name][value]
+        # IDs are assigned in ascending order, so appending is the common
+        # case.
+        if indexes[-1] < index:
+            indexes.append(index)
+            return
+        position = bisect.bisect_left(indexes, index)
+        if position == len(indexes) or indexes[position] != index:
+            indexes.insert(position, index)
+
+    def _remove_index_number(self, attribute_name: str, value: str, index: int) -> None:
+        """Remove the ID of an entry from the index store.
 
-    def _update_index(self) -> None:
-        """Update the index numbers. Wipe out the whole index, store and
-        generate it again."""
+        :param attribute_name: `mark` or `path`
+        :param value: The value of the attribute name.
+        :param index: The stable ID of the entry.
+        """
+        attribute_index_name = attribute_name + "s"
+        indexes = self._index[attribute_index_name].get(value)
+        if not indexes:
+            return
+        position = bisect.bisect_left(indexes, index)
+        if position < len(indexes) and indexes[position] == index:
+            del indexes[position]
+        if not indexes:
+            del self._index[attribute_index_name][value]
+
+    def _clear(self) -> None:
+        """Remove all entries and reset the index."""
+        self._version += 1
+        self._append_only = False
+        self._sorted_by = None
+        self._sorted_until = 0
+        self._entries = {}
+        self._entries_list = None
+        self._next_id = 0
         self._index = {
             "marks": {},
             "paths": {},
         }
-        index = 0
-        for entry in self.entries:
-            self._store_index_number("mark", entry.mark, index)
-            self._store_index_number("path", entry.path, index)
-            index += 1
+
+    def _append_entry(self, entry: StoredEntry) -> int:
+        """Append an entry and store its ID in the index.
+
+        :param entry: The entry object or a (mark, path) tuple.
+
+        :return: The index number of the entry in the list of entries.
+        """
+        index = self._next_id
+        self._next_id += 1
+        position = len(self._entries)
+        self._entries[index] = entry
+        self._entries_list = None
+        self._version += 1
+        mark, path = self._mark_and_path(entry)
+        self._store_index_number("mark", mark, index)
+        self._store_index_number("path", path, index)
+        return position
+
+    def _remove_entry(self, index: int) -> Entry:
+        """Remove an entry by its ID and drop it from the index.
+
+        :param index: The stable ID of the entry.
+
+        :return: The removed entry.
+        """
+        entry = self._materialize(index)
+        del self._entries[index]
+        self._entries_list = None
+        self._version += 1
+        self._append_only = False
+        self._remove_index_number("mark", entry.mark, index)
+        self._remove_index_number("path", entry.path, index)
+        return entry
+
+    def _set_entries(self, entries: list[StoredEntry]) -> None:
+        """Replace all entries. The IDs are renumbered in the order of
+        the new list.
+
+        :param entries: The new list of entries.
+        """
+        self._clear()
+        for entry in entries:
+            self._append_entry(entry)
 
     def _get_indexes(
         self, mark: Optional[str] = None, path: Optional[str] = None
@@ -479,8 +1434,7 @@ class ShellmarkManager:
         :param mark: The name of the bookmark / shellmark.
         :param path: The path of the bookmark / shellmark.
 
-        :return: A list of index numbers. Index numbers are starting from
-          0.
+        :return: A list of stable entry IDs in ascending order.
         :rtype: list
 
         :raises ValueError: If `mark` or `path` didn’t match.
@@ -491,15 +1445,15 @@ class ShellmarkManager:
         if mark not in marks and path not in paths:
             return []
         if mark and path:
-            if marks[mark] != paths[path]:
+            if mark not in marks or path not in paths or marks[mark] != paths[path]:
                 raise ValueError(
                     "mark ({}) and path ({}) didn’t match.".format(mark, path)
                 )
             return self._list_intersection(marks[mark], paths[path])
         elif mark and mark in marks:
-            return marks[mark]
+            return list(marks[mark])
         elif path and path in paths:
-            return paths[path]
+            return list(paths[path])
         return []
 
     def get_raw(self) -> str:
@@ -537,7 +1491,7 @@ class ShellmarkManager:
         """
 
         indexes = self._get_indexes(mark=mark, path=path)
-        return [self.entries[index] for index in indexes]
+        return [self._materialize(index) for index in indexes]
 
     def add_entry(
         self,
@@ -582,12 +1536,15 @@ class ShellmarkManager:
             or (avoid_duplicate_marks and not same_mark_entries)
             or (avoid_duplicate_paths and not same_path_entries)
         ):
-            entry = Entry(mark=mark, path=path, entry=entry_line, validate=validate)
-            index = len(self.entries)
-            self.entries.append(entry)
-            self._store_index_number("mark", entry.mark, index)
-            self._store_index_number("path", entry.path, index)
-            add_action: int = index
+            entry = Entry(
+                mark=mark,
+                path=path,
+                entry=entry_line,
+                validate=validate,
+                exists=self._path_cache.exists,
+                home_dir=self.home_dir,
+            )
+            add_action: int = self._append_entry(entry)
             if not silent:
                 self.changes.append(
                     {
@@ -615,12 +1572,18 @@ class ShellmarkManager:
         """
         indexes = self._get_indexes(mark=old_mark, path=old_path)
         for index in indexes:
-            entry = self.get_entry_by_index(index)
+            entry = self._materialize(index)
+            self._version += 1
+            self._append_only = False
+            self._sorted_by = None
             if new_mark:
+                self._remove_index_number("mark", entry.mark, index)
                 entry.mark = new_mark
+                self._store_index_number("mark", entry.mark, index)
             if new_path:
+                self._remove_index_number("path", entry.path, index)
                 entry.path = new_path
-        self._update_index()
+                self._store_index_number("path", entry.path, index)
 
     def delete_entries(
         self, mark: Optional[str] = None, path: Optional[str] = None
@@ -634,12 +1597,12 @@ class ShellmarkManager:
         :rtype: boolean
         """
         indexes = self._get_indexes(mark=mark, path=path)
-        # The deletion of an entry affects the index number of subsequent
-        # entries.
-        indexes.sort(reverse=True)
+        # Keep the order of the change records as before (last entry
+        # first).
+        indexes.reverse()
         delete_action = False
         for index in indexes:
-            entry = self.entries[index]
+            entry = self._remove_entry(index)
             self.changes.append(
                 {
                     "action": "delete",
@@ -647,67 +1610,208 @@ class ShellmarkManager:
                     "path": entry.path,
                 }
             )
-            del self.entries[index]
             delete_action = True
-        self._update_index()
         return delete_action
 
     def delete_duplicates(self, marks: bool = True, paths: bool = False) -> None:
-        """Delete duplicate entries.
+        """Delete duplicate entries. Entries at the end are preserved: An
+        entry is deleted if a later entry has the same mark (`marks`) or
+        the same path (`paths`). The entries are processed in a single
+        reverse scan.
 
         :param marks: Delete duplicate entries with the same
           mark attribute.
         :param paths: Delete duplicate entries with the same
           path attribute.
         """
-        # Create a copy of the entries list.
-        old_entries = list(self.entries)
-        self.entries = []
-        self._update_index()
-        for entry in old_entries:
-            self.add_entry(
-                mark=entry.mark,
-                path=entry.path,
-                validate=False,
-                avoid_duplicate_marks=marks,
-                avoid_duplicate_paths=paths,
-                delete_old_entries=True,
+        # The position of the nearest later entry with the same mark / path.
+        later_marks: dict[str, int] = {}
+        later_paths: dict[str, int] = {}
+        # (position of the deleting entry, 0 = by mark / 1 = by path,
+        # negative position of the deleted entry, ID of the deleted entry)
+        deletions: list[tuple[int, int, int, int]] = []
+        indexes = list(self._entries.keys())
+        for position in range(len(indexes) - 1, -1, -1):
+            index = indexes[position]
+            mark, path = self._mark_and_path(self._entries[index])
+            by_mark = later_marks.get(mark) if marks else None
+            by_path = later_paths.get(path) if paths else None
+            if by_mark is not None and (by_path is None or by_mark <= by_path):
+                deletions.append((by_mark, 0, -position, index))
+            elif by_path is not None:
+                deletions.append((by_path, 1, -position, index))
+            later_marks[mark] = position
+            later_paths[path] = position
+
+        # Report the deletions in the order in which the entries are
+        # superseded by later entries.
+        deletions.sort()
+        for _, _, _, index in deletions:
+            entry = self._remove_entry(index)
+            self.changes.append(
+                {
+                    "action": "delete",
+                    "mark": entry.mark,
+                    "path": entry.path,
+                }
             )
 
-        duplicate_entries = len(old_entries) - len(self.entries)
-        if duplicate_entries > 0:
+        if len(deletions) > 0:
             self.changes.append(
-                {"action": "delete_duplicates", "count": duplicate_entries}
+                {"action": "delete_duplicates", "count": len(deletions)}
             )
 
-    def cleanup(self) -> None:
-        """Clean up invalid entries. Readd all entries which are valid."""
-        # Create a copy of the entries list.
-        old_entries = list(self.entries)
-        self.entries = []
-        self._update_index()
-        for entry in old_entries:
-            try:
-                self.add_entry(mark=entry.mark, path=entry.path, validate=True)
-            except ShellmarksError:
-                pass
+    def reconcile(self, desired: list[tuple[str, str]]) -> None:
+        """Make the entries match exactly the desired bookmarks in one pass
+        over the entries. Entries whose mark isn’t desired and duplicate
+        marks are deleted, entries with a different path are updated in
+        place and the missing bookmarks are appended in the desired order.
+        All differences are recorded as a single change.
+
+        :param desired: A list of (mark, path) tuples. If a mark is listed
+          more than once, the last path wins.
+
+        :raises MarkInvalidError: If a desired mark is invalid.
+        :raises NoPathError: If a desired path doesn’t exist.
+        """
+        wanted: dict[str, Entry] = {}
+        for mark, path in desired:
+            wanted[mark] = Entry(
+                mark=mark,
+                path=path,
+                exists=self._path_cache.exists,
+                home_dir=self.home_dir,
+            )
+
+        kept: list[StoredEntry] = []
+        seen: set[str] = set()
+        removed: list[str] = []
+        updated: list[str] = []
+        for stored in self._entries.values():
+            mark, path = self._mark_and_path(stored)
+            entry = wanted.get(mark)
+            if entry is None or mark in seen:
+                removed.append(mark)
+                continue
+            seen.add(mark)
+            if path == entry.path:
+                kept.append(stored)
+            else:
+                kept.append(entry)
+                updated.append(mark)
+        added = [mark for mark in wanted if mark not in seen]
+
+        if not added and not removed and not updated:
+            return
+        if removed or updated:
+            self._set_entries(kept + [wanted[mark] for mark in added])
+        else:
+            # Keep the IDs, the known sort order and the append fast path.
+            for mark in added:
+                self._append_entry(wanted[mark])
+        self.changes.append(
+            {
+                "action": "reconcile",
+                "added": added,
+                "removed": removed,
+                "updated": updated,
+            }
+        )
 
-        cleanup_entries = len(old_entries) - len(self.entries)
-        if cleanup_entries > 0:
-            self.changes.append({"action": "cleanup", "count": cleanup_entries})
+    def cleanup(
+        self,
+        workers: int = 1,
+        timeout: Optional[float] = None,
+        keep_timed_out: bool = True,
+    ) -> None:
+        """Clean up invalid entries: Delete entries with an invalid mark
+        or a non-existent path.
+
+        :param workers: The number of paths that are checked concurrently.
+        :param timeout: The maximum number of seconds for the existence
+          check of one path.
+        :param keep_timed_out: Keep the entries whose existence check
+          timed out.
+        """
+        results = check_paths(
+            [self._mark_and_path(stored)[1] for stored in self._entries.values()],
+            workers=workers,
+            timeout=timeout,
+            exists=self._path_cache.exists,
+        )
+        timed_out: list[str] = []
+        cleanup_entries = 0
+        for index, stored in list(self._entries.items()):
+            mark, path = self._mark_and_path(stored)
+            exists = results[path]
+            if exists is None:
+                if path not in timed_out:
+                    timed_out.append(path)
+                if keep_timed_out:
+                    continue
+            elif exists and Entry.check_mark(mark):
+                continue
+            self._remove_entry(index)
+            cleanup_entries += 1
+
+        if cleanup_entries > 0 or timed_out:
+            change: dict[str, str | int | list[str]] = {
+                "action": "cleanup",
+                "count": cleanup_entries,
+            }
+            if timed_out:
+                change["timed_out"] = timed_out
+                change["timed_out_kept"] = keep_timed_out
+            self.changes.append(change)
 
     def sort(
         self, attribute_name: Literal["mark", "path"] = "mark", reverse: bool = False
     ) -> None:
-        """Sort the bookmark entries by mark or path.
+        """Sort the bookmark entries by mark or path. The sort order is
+        remembered: An already sorted list is verified only once in O(n),
+        entries added afterwards are merged into the sorted entries and a
+        list in the correct order isn’t touched at all. A change is only
+        recorded if the order of the entries changed.
 
         :param attribute_name: 'mark' or 'path'
         :param reverse: Reverse the sort.
         """
-        self.entries.sort(
-            key=lambda entry: getattr(entry, attribute_name), reverse=reverse
-        )
-        self._update_index()
+        position = 0 if attribute_name == "mark" else 1
+
+        def key(stored: StoredEntry) -> str:
+            return self._mark_and_path(stored)[position]
+
+        def in_order(keys: Iterable[str]) -> bool:
+            if reverse:
+                return all(a >= b for a, b in itertools.pairwise(keys))
+            return all(a <= b for a, b in itertools.pairwise(keys))
+
+        if self._sorted_by == (attribute_name, reverse):
+            # The sorted entries and the entries added afterwards.
+            old: list[StoredEntry] = []
+            new: list[StoredEntry] = []
+            for index, stored in self._entries.items():
+                (old if index < self._sorted_until else new).append(stored)
+            if not new:
+                return
+            new.sort(key=key, reverse=reverse)
+            entries = list(heapq.merge(old, new, key=key, reverse=reverse))
+        else:
+            if in_order(key(stored) for stored in self._entries.values()):
+                self._sorted_by = (attribute_name, reverse)
+                self._sorted_until = self._next_id
+                return
+            entries = sorted(self._entries.values(), key=key, reverse=reverse)
+
+        if all(
+            a is b for a, b in zip(entries, self._entries.values())
+        ):  # Only appended entries in the correct order.
+            self._sorted_until = self._next_id
+            return
+
+        self._set_entries(entries)
+        self._sorted_by = (attribute_name, reverse)
+        self._sorted_until = self._next_id
         self.changes.append(
             {
                 "action": "sort",
@@ -716,46 +1820,394 @@ class ShellmarkManager:
             }
         )
 
-    def write(self, new_path: str = "") -> None:
-        """Write the bookmark / shellmarks to the disk.
+    def write(self, new_path: str = "") -> bool:
+        """Write the bookmark / shellmarks to the disk. The target is
+        replaced atomically (:func:`write_atomically`), mode and ownership
+        of an existing target are preserved. Nothing is written if the
+        target already has the same content.
 
         :param new_path: Path of a different output file then specifed
           by the initialisation of the object.
+
+        :return: True if the file was written.
         """
+        if not new_path and self._append():
+            return True
         if new_path:
             path = new_path
         else:
             path = self.path
-        output_file = open(path, "w")
-        for entry in self.entries:
-            output_file.write(
-                entry.to_export_string(replace_home=self.replace_home) + "\n"
+        # Replace the target of a symbolic link, not the link itself.
+        path = os.path.realpath(path)
+        content = "".join(self._render_lines()).encode()
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and stat.st_size == len(content):
+            with open(path, "rb") as target:
+                if target.read() == content:
+                    return False
+
+        write_atomically(path, content, stat=stat)
+        return True
+
+    def _append(self) -> bool:
+        """Append the new entries to the file instead of rewriting it. This
+        is only possible if entries were only appended since the file was
+        loaded, the file wasn’t modified in the meantime and the original
+        entries render to exactly the original content.
+
+        :return: True if the new entries were appended.
+        """
+        if not self._append_only or self._original_stat is None:
+            return False
+        if len(self._entries) == self._original_count:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._stat_identity(stat) != self._original_stat:
+            return False
+
+        lines = self._render_lines()
+        digest = hashlib.sha256()
+        for line in itertools.islice(lines, self._original_count):
+            digest.update(line.encode())
+        if digest.hexdigest() != self._original_digest:
+            return False
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        with os.fdopen(fd, "wb") as sdirs:
+            sdirs.write(b"".join(line.encode() for line in lines))
+            sdirs.flush()
+            os.fsync(sdirs.fileno())
+        return True
+
+    @staticmethod
+    def _map(function: Callable[[T], R], items: list[T], workers: int) -> list[R]:
+        """Apply a function to all items, in a thread pool if `workers` is
+        greater than 1. The order of the results is the order of the
+        items."""
+        if workers > 1 and len(items) > 1:
+            # Imported on demand: concurrent.futures is slow to import.
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(function, items))
+        return [function(item) for item in items]
+
+    @staticmethod
+    def _is_exported(entry: Entry, query_command: Optional[str]) -> bool:
+        """Check with the query command if the entry is already
+        exported."""
+        return (
+            query_command is not None and entry.run_command(query_command) is not None
+        )
+
+    @staticmethod
+    def _export_entry(
+        entry: Entry, command: str, query_command: Optional[str]
+    ) -> tuple[Optional[str], bool]:
+        """Export one entry unless the query command reports that it is
+        already exported.
+
+        :return: A tuple of the executed export command (or None) and True
+          if the entry is exported.
+        """
+        if ShellmarkManager._is_exported(entry, query_command):
+            return None, True
+        executed = entry.run_command(command)
+        return executed, executed is not None
+
+    @staticmethod
+    def _list_exported(list_command: str) -> Optional[set[str]]:
+        """Run a command that lists the already exported paths.
+
+        :param list_command: A command that prints one path per line.
+
+        :return: A set of paths or None if the command failed.
+        """
+        try:
+            result = subprocess.run(
+                shlex.split(list_command),
+                capture_output=True,
+                encoding="utf-8",
             )
-        output_file.close()
+        except OSError:
+            return None
+        if result.returncode != 0:
+            return None
+        return set(line.rstrip("\n") for line in result.stdout.splitlines())
+
+    def _digest(self) -> str:
+        """The SHA-256 digest of the rendered bookmark file."""
+        digest = hashlib.sha256()
+        for line in self._render_lines():
+            digest.update(line.encode())
+        return digest.hexdigest()
 
-    def export(self, command: str, query_command: Optional[str]) -> None:
-        for entry in self.entries:
-            if query_command is not None:
-                query = entry.run_command(query_command)
+    @staticmethod
+    def _read_ledger(ledger: str) -> dict[str, dict[str, object]]:
+        """Read the export ledger. A missing or corrupt ledger is treated
+        as empty.
+
+        :param ledger: The path of the ledger file.
+
+        :return: A dictionary. The key is the export command template, the
+          value a dictionary with the keys `digest` and `entries`.
+        """
+        try:
+            with open(ledger, "r") as ledger_file:
+                content = json.load(ledger_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(content, dict):
+            return {}
+        return content
+
+    @staticmethod
+    def _ledger_entries(stored: object) -> Optional[set[tuple[str, str]]]:
+        """Validate the ledger record of one export command.
+
+        :param stored: The value of the ledger for the export command.
+
+        :return: The exported entries as tuples of mark and path or None
+          if the record is missing or corrupt.
+        """
+        if not isinstance(stored, dict):
+            return None
+        stored_entries = stored.get("entries")
+        if not isinstance(stored_entries, list):
+            return None
+        entries: set[tuple[str, str]] = set()
+        for item in stored_entries:
+            if (
+                not isinstance(item, list)
+                or len(item) != 2
+                or not isinstance(item[0], str)
+                or not isinstance(item[1], str)
+            ):
+                return None
+            entries.add((item[0], item[1]))
+        return entries
+
+    @staticmethod
+    def _arg_max() -> int:
+        """The number of bytes available for the arguments of a new
+        process: ARG_MAX minus the size of the environment and a safety
+        margin."""
+        try:
+            arg_max = os.sysconf("SC_ARG_MAX")
+        except (ValueError, OSError):
+            arg_max = -1
+        if arg_max <= 0:
+            arg_max = 131072
+        environment = sum(
+            len(key) + len(value) + 2 + 8 for key, value in os.environ.items()
+        )
+        return arg_max - environment - 4096
+
+    @staticmethod
+    def _chunk_paths(
+        command: str, paths: list[str], batch_size: int, arg_max: int
+    ) -> list[list[str]]:
+        """Split the paths into chunks that are passed to one invocation of
+        the batch export command.
+
+        :param command: The export command containing %paths.
+        :param paths: The paths to export.
+        :param batch_size: The maximum number of paths per chunk.
+        :param arg_max: The maximum number of bytes of all arguments
+          (including the pointers to the arguments).
+        """
+        base_size = sum(len(arg.encode()) + 1 + 8 for arg in shlex.split(command))
+        chunks: list[list[str]] = []
+        chunk: list[str] = []
+        size = base_size
+        for path in paths:
+            path_size = len(path.encode()) + 1 + 8
+            if chunk and (len(chunk) >= batch_size or size + path_size > arg_max):
+                chunks.append(chunk)
+                chunk = []
+                size = base_size
+            chunk.append(path)
+            size += path_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _run_batch(command: str, paths: list[str]) -> tuple[str, bool]:
+        """Run the batch export command for one chunk of paths.
+
+        :return: A tuple of the executed command and True if the command
+          was successful.
+        """
+        args: list[str] = []
+        for arg in shlex.split(command):
+            if arg == "%paths":
+                args += paths
             else:
-                query = None
-            if query is None:
-                result = entry.run_command(command)
+                args.append(arg)
+        result = subprocess.run(args, capture_output=True, encoding="utf-8")
+        return shlex.join(args), result.returncode == 0
+
+    def export(
+        self,
+        command: str,
+        query_command: Optional[str],
+        workers: int = 1,
+        list_command: Optional[str] = None,
+        batch_size: int = 100,
+        ledger: Optional[str] = None,
+        write_ledger: bool = True,
+    ) -> None:
+        """Export the entries by running a command for each entry or, if
+        the command contains the placeholder `%paths`, for each chunk of
+        entries.
+
+        :param command: The export command.
+        :param query_command: A command to check if an entry is already
+          exported.
+        :param workers: The maximum number of commands that are executed
+          concurrently.
+        :param list_command: A command that is run once and lists the
+          already exported paths. These entries are skipped.
+        :param batch_size: The maximum number of paths per invocation of
+          a batch export command.
+        :param ledger: The path of a ledger file which stores the already
+          exported entries for each export command.
+        :param write_ledger: Update the ledger file after the export.
+          False in check mode.
+        """
+        entries = self.entries
+        # The entries which are known to be exported after this run.
+        done: list[Entry] = []
+
+        ledger_content: dict[str, dict[str, object]] = {}
+        ledger_entries: set[tuple[str, str]] = set()
+        digest = ""
+        if ledger is not None:
+            digest = self._digest()
+            ledger_content = self._read_ledger(ledger)
+            stored = ledger_content.get(command)
+            stored_entries = self._ledger_entries(stored)
+            if stored_entries is not None:
+                if isinstance(stored, dict) and stored.get("digest") == digest:
+                    return
+                ledger_entries = stored_entries
+            entries = [
+                entry
+                for entry in entries
+                if (entry.mark, entry.path) not in ledger_entries
+            ]
+
+        if list_command is not None:
+            exported = self._list_exported(list_command)
+            if exported is not None:
+                done += [entry for entry in entries if entry.path in exported]
+                entries = [entry for entry in entries if entry.path not in exported]
+
+        failed_commands: list[str] = []
+        if "%paths" in shlex.split(command):
+            if query_command is not None:
+                is_exported = self._map(
+                    lambda entry: self._is_exported(entry, query_command),
+                    entries,
+                    workers,
+                )
+                done += [entry for entry, check in zip(entries, is_exported) if check]
+                entries = [
+                    entry for entry, check in zip(entries, is_exported) if not check
+                ]
+            chunks = self._chunk_paths(
+                command,
+                [entry.path for entry in entries],
+                max(batch_size, 1),
+                self._arg_max(),
+            )
+            position = 0
+            for chunk, (executed, success) in zip(
+                chunks,
+                self._map(
+                    lambda chunk: self._run_batch(command, chunk), chunks, workers
+                ),
+            ):
+                if success:
+                    self.__export_commands.append(executed)
+                    done += entries[position : position + len(chunk)]
+                else:
+                    failed_commands.append(executed)
+                position += len(chunk)
+        else:
+            for entry, (result, success) in zip(
+                entries,
+                self._map(
+                    lambda entry: self._export_entry(entry, command, query_command),
+                    entries,
+                    workers,
+                ),
+            ):
                 if result is not None:
                     self.__export_commands.append(result)
-        if len(self.__export_commands) > 0:
-            self.changes.append(
-                {"action": "export", "export_commands": self.__export_commands}
+                if success:
+                    done.append(entry)
+
+        if ledger is not None and write_ledger:
+            current = set((entry.mark, entry.path) for entry in self.entries)
+            exported_entries = (ledger_entries & current) | set(
+                (entry.mark, entry.path) for entry in done
+            )
+            ledger_content[command] = {
+                # Only a complete export allows to skip the next export.
+                "digest": digest if exported_entries == current else None,
+                "entries": sorted(exported_entries),
+            }
+            # The ledger only speeds up the next export.
+            write_atomically(
+                ledger, json.dumps(ledger_content).encode(), ignore_errors=True
             )
 
+        if len(self.__export_commands) > 0 or len(failed_commands) > 0:
+            change: dict[str, str | int | list[str]] = {
+                "action": "export",
+                "export_commands": self.__export_commands,
+            }
+            if len(failed_commands) > 0:
+                change["failed_export_commands"] = failed_commands
+            self.changes.append(change)
+
+
+class MarkParams(TypedDict):
+    mark: Optional[str]
+    path: Optional[str]
+    state: Literal["present", "absent"]
+
 
 class ModuleParams(TypedDict):
     cleanup: bool
+    cleanup_keep_timed_out: bool
+    cleanup_timeout: Optional[float]
+    cleanup_workers: int
     delete_duplicates: bool
+    exclusive: bool
     export: Optional[str]
+    export_batch_size: int
     export_check: Optional[str]
+    export_ledger: bool
+    export_list: Optional[str]
+    export_workers: int
+    index_cache: bool
+    lock_timeout: float
+    locking: Literal["exclusive", "optimistic", "none"]
     mark: Optional[str]
+    marks: Optional[list[MarkParams]]
     path: Optional[str]
+    profile: bool
+    profile_output: Optional[str]
     replace_home: bool
     sdirs: str
     sorted: bool
@@ -764,27 +2216,265 @@ class ModuleParams(TypedDict):
 
 class OptionalModuleParams(TypedDict, total=False):
     cleanup: bool
+    cleanup_keep_timed_out: bool
+    cleanup_timeout: Optional[float]
+    cleanup_workers: int
     delete_duplicates: bool
+    exclusive: bool
     export: Optional[str]
+    export_batch_size: int
     export_check: Optional[str]
+    export_ledger: bool
+    export_list: Optional[str]
+    export_workers: int
+    index_cache: bool
+    lock_timeout: float
+    locking: Literal["exclusive", "optimistic", "none"]
     mark: Optional[str]
+    marks: Optional[list[MarkParams]]
     path: Optional[str]
+    profile: bool
+    profile_output: Optional[str]
     replace_home: bool
     sdirs: str
     sorted: bool
     state: Literal["present", "absent"]
 
 
+def apply_mark(
+    module: AnsibleModule, manager: ShellmarkManager, item: MarkParams
+) -> None:
+    """Add or delete one bookmark specified by the keys mark, path and
+    state.
+
+    :param module: The Ansible module to report failures to.
+    :param manager: The manager the bookmark is applied against.
+    :param item: A dictionary with the keys mark, path and state.
+    """
+    mark = item.get("mark")
+    path = item.get("path")
+    state = item.get("state", "present")
+
+    if mark and path and state == "present":
+        try:
+            manager.add_entry(
+                mark=mark,
+                path=path,
+                avoid_duplicate_marks=True,
+                avoid_duplicate_paths=True,
+                delete_old_entries=True,
+                silent=False,
+            )
+        except NoPathError as exception:
+            module.fail_json(msg=str(exception))
+        except MarkInvalidError as exception:
+            module.fail_json(msg=str(exception))
+
+    if (mark or path) and state == "absent":
+        manager.delete_entries(mark=mark, path=path)
+
+
+def is_already_present(params: ModuleParams, home_dir: str) -> bool:
+    """Check on the raw content of the bookmark file if the module would
+    leave it unchanged, without loading it into a
+    :class:`ShellmarkManager`. Only the common case is covered: a single
+    bookmark (mark and path) with the state present and no other
+    operation. The bookmark line has to be present exactly once, no other
+    line may have the same mark or path and the whole file has to be in
+    the form the module writes (normalized absolute paths, $HOME
+    according to `replace_home`, sorted if `sorted` is true, otherwise
+    the bookmark has to be the last line).
+
+    :param params: The module parameters.
+    :param home_dir: The path of the home directory.
+
+    :return: True if the module can exit unchanged.
+    """
+    mark = params["mark"]
+    path = params["path"]
+    if (
+        not mark
+        or not path
+        or params["state"] != "present"
+        or params["marks"]
+        or params["exclusive"]
+        or params["cleanup"]
+        or params["delete_duplicates"]
+        or params["export"]
+    ):
+        return False
+    path = Entry.normalize_path(path, home_dir)
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(params["sdirs"], "rb") as sdirs:
+            content = sdirs.read()
+    except OSError:
+        return False
+    if CANONICAL_SDIRS_REGEX.fullmatch(content) is None:
+        return False
+    # A leading newline makes every line start with a newline.
+    content = b"\n" + content
+
+    line = Entry.render(mark, path, home_dir, params["replace_home"]).encode()
+    rendered_path = line[line.index(b'="') + 2 : -1]
+    if (
+        content.count(b"\n" + line + b"\n") != 1
+        or content.count(b"\nexport DIR_" + mark.encode() + b'="') != 1
+        or content.count(b'="' + rendered_path + b'"\n') != 1
+    ):
+        return False
+
+    # Every path has to be absolute or start with $HOME and has to be
+    # normalized.
+    absolute = content.count(b'="/')
+    if params["replace_home"]:
+        if home_dir.encode() in content:
+            return False
+        absolute += content.count(b'="$HOME')
+    elif b'="$HOME' in content:
+        return False
+    if absolute != content.count(b"\n") - 1:
+        return False
+    if any(
+        fragment in content for fragment in (b"//", b"/./", b"/../", b'/."', b'/.."')
+    ):
+        return False
+    if content.count(b'/"\n') != content.count(b'="/"\n'):
+        return False
+
+    if params["sorted"]:
+        marks = re.findall(rb"\nexport DIR_([0-9a-zA-Z_]+)=", content)
+        if any(a > b for a, b in itertools.pairwise(marks)):
+            return False
+    elif not content.endswith(b"\n" + line + b"\n"):
+        # An existing bookmark is deleted and appended again.
+        return False
+    return True
+
+
+def load_and_apply(
+    module: AnsibleModule,
+    params: ModuleParams,
+    home_dir: str,
+    timer: Optional[PhaseTimer] = None,
+) -> Optional[ShellmarkManager]:
+    """Load the bookmark file and apply all bookmark operations of the
+    module parameters except the export.
+
+    :param module: The Ansible module to report failures to.
+    :param params: The module parameters.
+    :param home_dir: The path of the home directory.
+    :param timer: Records the time of the phases load, marks, cleanup,
+      delete_duplicates and sort.
+
+    :return: The manager or None if the module failed.
+    """
+    if timer is None:
+        timer = PhaseTimer(enabled=False)
+    try:
+        with timer.phase("load"):
+            manager = ShellmarkManager(
+                path=params["sdirs"],
+                validate_on_init=False,
+                home_dir=home_dir,
+                index_path=(
+                    params["sdirs"] + ".idx"
+                    if params["index_cache"] and not module.check_mode
+                    else None
+                ),
+            )
+    except SdirsSyntaxError as exception:
+        module.fail_json(msg=str(exception))
+        return None
+    manager.replace_home = params["replace_home"]
+
+    items: list[MarkParams] = [
+        {"mark": params["mark"], "path": params["path"], "state": params["state"]}
+    ]
+    if params["marks"]:
+        items += params["marks"]
+
+    if params["exclusive"]:
+        desired: list[tuple[str, str]] = []
+        for item in items:
+            mark = item.get("mark")
+            path = item.get("path")
+            if not mark or item.get("state", "present") != "present":
+                continue
+            if not path:
+                module.fail_json(
+                    msg="The bookmark “{}” has no path. In the exclusive mode "
+                    "every bookmark needs a path.".format(mark)
+                )
+                return None
+            desired.append((mark, path))
+        try:
+            with timer.phase("marks"):
+                manager.reconcile(desired)
+        except (NoPathError, MarkInvalidError) as exception:
+            module.fail_json(msg=str(exception))
+            return None
+    else:
+        for item in items:
+            with timer.phase("marks"):
+                apply_mark(module, manager, item)
+
+    if params["cleanup"]:
+        with timer.phase("cleanup"):
+            manager.cleanup(
+                workers=params["cleanup_workers"],
+                timeout=params["cleanup_timeout"],
+                keep_timed_out=params["cleanup_keep_timed_out"],
+            )
+
+    if params["delete_duplicates"]:
+        with timer.phase("delete_duplicates"):
+            manager.delete_duplicates()
+
+    if params["sorted"]:
+        with timer.phase("sort"):
+            manager.sort()
+
+    return manager
+
+
 def main() -> None:
     """Main function which gets called by Ansible."""
+    import cProfile
+
+    from ansible.module_utils.basic import AnsibleModule
+
     module = AnsibleModule(
         argument_spec=dict(
             cleanup=dict(default=False, type="bool"),
+            cleanup_keep_timed_out=dict(default=True, type="bool"),
+            cleanup_timeout=dict(type="float"),
+            cleanup_workers=dict(default=1, type="int"),
             delete_duplicates=dict(default=False, type="bool"),
+            exclusive=dict(default=False, type="bool"),
             export=dict(type="str"),
+            export_batch_size=dict(default=100, type="int"),
             export_check=dict(type="str"),
+            export_ledger=dict(default=False, type="bool"),
+            export_list=dict(type="str"),
+            export_workers=dict(default=1, type="int"),
+            index_cache=dict(default=False, type="bool"),
+            lock_timeout=dict(default=10.0, type="float"),
+            locking=dict(default="none", choices=["exclusive", "optimistic", "none"]),
             mark=dict(aliases=["bookmark"]),
+            marks=dict(
+                type="list",
+                elements="dict",
+                options=dict(
+                    mark=dict(required=True, aliases=["bookmark"]),
+                    path=dict(aliases=["src"]),
+                    state=dict(default="present", choices=["present", "absent"]),
+                ),
+            ),
             path=dict(aliases=["src"]),
+            profile=dict(default=False, type="bool"),
+            profile_output=dict(type="str"),
             replace_home=dict(default=True, type="bool"),
             sdirs=dict(default="~/.sdirs"),
             sorted=dict(default=True, type="bool"),
@@ -795,49 +2485,246 @@ def main() -> None:
 
     params: ModuleParams = cast(ModuleParams, module.params)
 
-    home_dir = pwd.getpwuid(os.getuid()).pw_dir
+    timer = PhaseTimer(enabled=params["profile"])
+    profile_output = params["profile_output"]
+    profiler: Optional[cProfile.Profile] = None
+    if profile_output:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        result = run_module(module, params, timer)
+    finally:
+        if profiler is not None and profile_output:
+            profiler.disable()
+            profiler.dump_stats(os.path.expanduser(profile_output))
+    if result is None:
+        return
+
+    if params["profile"]:
+        result["timings"] = timer.timings
+    module.exit_json(**result)
+
+
+def run_module(
+    module: AnsibleModule, params: ModuleParams, timer: PhaseTimer
+) -> Optional[dict[str, object]]:
+    """Apply the module parameters to the bookmark file.
+
+    :param module: The Ansible module to report failures to.
+    :param params: The module parameters.
+    :param timer: Records the time of the phases.
+
+    :return: The keyword arguments for ``exit_json`` or None if the
+      module failed.
+    """
+    home_dir = get_home_dir()
     params["sdirs"] = Entry.normalize_path(params["sdirs"], home_dir)
-    manager = ShellmarkManager(path=params["sdirs"], validate_on_init=False)
-    manager.replace_home = params["replace_home"]
 
-    if params["mark"] and params["path"] and params["state"] == "present":
-        try:
-            manager.add_entry(
-                mark=params["mark"],
-                path=params["path"],
-                avoid_duplicate_marks=True,
-                avoid_duplicate_paths=True,
-                delete_old_entries=True,
-                silent=False,
+    with timer.phase("already_present"):
+        already_present = is_already_present(params, home_dir)
+    if already_present:
+        return {"changed": False}
+
+    locking = "none" if module.check_mode else params["locking"]
+
+    def lock(mode: str) -> contextlib.AbstractContextManager[object]:
+        if locking != mode:
+            return contextlib.nullcontext()
+        return FileLock(params["sdirs"] + ".lock", params["lock_timeout"])
+
+    manager: Optional[ShellmarkManager] = None
+    try:
+        for _ in range(OPTIMISTIC_ATTEMPTS):
+            with lock("exclusive"):
+                manager = load_and_apply(module, params, home_dir, timer)
+                if manager is None:
+                    return None
+                with timer.phase("changed"):
+                    changed = manager.changed
+                if module.check_mode or not changed:
+                    break
+                with lock("optimistic"):
+                    if locking == "optimistic" and manager.modified_since_load():
+                        # Apply the operations again on the fresh content.
+                        continue
+                    with timer.phase("write"):
+                        manager.write()
+                    break
+        else:
+            module.fail_json(
+                msg="The bookmark file was changed by another process "
+                "{} times in a row.".format(OPTIMISTIC_ATTEMPTS)
+            )
+            return None
+    except LockTimeoutError as exception:
+        module.fail_json(msg=str(exception))
+        return None
+    if manager is None:
+        return None
+
+    if params["export"]:
+        with timer.phase("export"):
+            manager.export(
+                params["export"],
+                params["export_check"],
+                workers=params["export_workers"],
+                list_command=params["export_list"],
+                batch_size=params["export_batch_size"],
+                ledger=(
+                    params["sdirs"] + ".export" if params["export_ledger"] else None
+                ),
+                write_ledger=not module.check_mode,
             )
-        except NoPathError as exception:
-            module.fail_json(msg=str(exception))
-        except MarkInvalidError as exception:
-            module.fail_json(msg=str(exception))
 
-    if (params["mark"] or params["path"]) and params["state"] == "absent":
-        manager.delete_entries(mark=params["mark"], path=params["path"])
+    with timer.phase("changed"):
+        changed = manager.changed
+    result: dict[str, object] = {"changed": changed}
+    if changed and manager.changes:
+        result["changes"] = manager.changes
+    # Reported even if the kept entries leave the file unchanged.
+    timed_out = [
+        path
+        for change in manager.changes
+        if change["action"] == "cleanup"
+        for path in cast(list[str], change.get("timed_out", []))
+    ]
+    if timed_out:
+        result["timed_out"] = timed_out
+    return result
 
-    if params["cleanup"]:
-        manager.cleanup()
 
-    if params["delete_duplicates"]:
-        manager.delete_duplicates()
+COMMANDS = ("add", "rm", "ls", "cleanup", "dedup", "export")
+"""The subcommands of the command line interface."""
 
-    if params["sorted"]:
-        manager.sort()
 
-    if params["export"]:
-        manager.export(params["export"], params["export_check"])
+def cli(argv: Optional[list[str]] = None) -> int:
+    """The command line interface (``python -m shellmarks``) for shell
+    hooks and cron jobs. It doesn’t import Ansible. The bookmark file is
+    locked from loading to writing, except for listing.
 
-    if not module.check_mode and manager.changed:
-        manager.write()
+    :param argv: The command line arguments without the program name.
+      Defaults to :data:`sys.argv`.
 
-    if manager.changed and manager.changes:
-        module.exit_json(changed=manager.changed, changes=manager.changes)
-    else:
-        module.exit_json(changed=manager.changed)
+    :return: The exit status.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m shellmarks",
+        description="Manage the bookmarks of the file ~/.sdirs.",
+    )
+    parser.add_argument(
+        "--sdirs", default="~/.sdirs", help="The path of the bookmark file."
+    )
+    parser.add_argument(
+        "--no-replace-home",
+        dest="replace_home",
+        action="store_false",
+        help="Don’t replace the home directory with $HOME.",
+    )
+    parser.add_argument(
+        "--no-sort",
+        dest="sorted",
+        action="store_false",
+        help="Don’t sort the bookmarks by mark.",
+    )
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        default=10.0,
+        help="The maximum number of seconds to wait for the lock.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser("add", help="Add or replace a bookmark.")
+    add.add_argument("mark")
+    add.add_argument("path")
+
+    rm = subparsers.add_parser("rm", help="Delete bookmarks.")
+    rm.add_argument("mark", nargs="?")
+    rm.add_argument("--path")
+
+    subparsers.add_parser("ls", help="List the bookmarks.")
+
+    cleanup = subparsers.add_parser(
+        "cleanup", help="Delete bookmarks of nonexistent directories."
+    )
+    cleanup.add_argument("--workers", type=int, default=1)
+    cleanup.add_argument("--timeout", type=float)
+
+    subparsers.add_parser("dedup", help="Delete duplicate bookmarks.")
+
+    export = subparsers.add_parser("export", help="Export the bookmarks.")
+    export.add_argument("export_command", metavar="command")
+    export.add_argument("--check")
+    export.add_argument("--list")
+    export.add_argument("--workers", type=int, default=1)
+    export.add_argument("--batch-size", type=int, default=100)
+
+    args = parser.parse_args(argv)
+
+    home_dir = get_home_dir()
+    sdirs = Entry.normalize_path(args.sdirs, home_dir)
+    lock: contextlib.AbstractContextManager[object] = (
+        contextlib.nullcontext()
+        if args.command == "ls"
+        else FileLock(sdirs + ".lock", args.lock_timeout)
+    )
+    try:
+        with lock:
+            manager = ShellmarkManager(
+                path=sdirs, validate_on_init=False, home_dir=home_dir
+            )
+            manager.replace_home = args.replace_home
+
+            if args.command == "ls":
+                for entry in manager.entries:
+                    print("{}\t{}".format(entry.mark, entry.path))
+                return 0
+
+            if args.command == "add":
+                manager.add_entry(
+                    mark=args.mark,
+                    path=args.path,
+                    avoid_duplicate_marks=True,
+                    avoid_duplicate_paths=True,
+                    delete_old_entries=True,
+                )
+            elif args.command == "rm":
+                if not args.mark and not args.path:
+                    parser.error("rm needs a mark or --path")
+                path = Entry.normalize_path(args.path, home_dir) if args.path else None
+                manager.delete_entries(mark=args.mark, path=path)
+            elif args.command == "cleanup":
+                manager.cleanup(workers=args.workers, timeout=args.timeout)
+            elif args.command == "dedup":
+                manager.delete_duplicates()
+            elif args.command == "export":
+                manager.export(
+                    args.export_command,
+                    args.check,
+                    workers=args.workers,
+                    list_command=args.list,
+                    batch_size=args.batch_size,
+                )
+
+            if args.sorted:
+                manager.sort()
+            if manager.changed:
+                manager.write()
+    except (ShellmarksError, OSError, ValueError) as exception:
+        print("{}: {}".format(parser.prog, exception), file=sys.stderr)
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
+    # Ansible runs the module without arguments or with the path of an
+    # arguments file, but never from a terminal.
+    if len(sys.argv) > 1:
+        if sys.argv[1] in COMMANDS or sys.argv[1].startswith("-"):
+            sys.exit(cli())
+    elif sys.stdin.isatty():
+        # Prints the usage instead of waiting for the module arguments.
+        sys.exit(cli())
     main()
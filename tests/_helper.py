@@ -69,11 +69,25 @@ def mock_main(params: OptionalModuleParams, check_mode: bool = False) -> MockRes
     sdirs = tmp_file()
     defaults = {
         "cleanup": False,
+        "cleanup_keep_timed_out": True,
+        "cleanup_timeout": None,
+        "cleanup_workers": 1,
         "delete_duplicates": False,
+        "exclusive": False,
         "export": None,
+        "export_batch_size": 100,
         "export_check": None,
+        "export_ledger": False,
+        "export_list": None,
+        "export_workers": 1,
+        "index_cache": False,
+        "lock_timeout": 10.0,
+        "locking": "none",
         "mark": None,
+        "marks": None,
         "path": None,
+        "profile": False,
+        "profile_output": None,
         "replace_home": False,
         "sdirs": sdirs,
         "sorted": False,
@@ -86,7 +100,7 @@ def mock_main(params: OptionalModuleParams, check_mode: bool = False) -> MockRes
 
     p = cast(ModuleParams, params)
 
-    with mock.patch("shellmarks.AnsibleModule") as AnsibleModule:
+    with mock.patch("ansible.module_utils.basic.AnsibleModule") as AnsibleModule:
         module = AnsibleModule.return_value
         module.params = params
         module.check_mode = check_mode
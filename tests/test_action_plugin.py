@@ -0,0 +1,139 @@
+import hashlib
+import importlib.util
+import os
+import subprocess
+from types import ModuleType
+from typing import Any
+from unittest import mock
+
+from ._helper import DIR1, create_tmp_text_file_with_content, tmp_dir
+
+
+def load_plugin() -> ModuleType:
+    spec = importlib.util.spec_from_file_location(
+        "shellmarks_action",
+        os.path.join(
+            os.path.dirname(__file__), "..", "action_plugins", "shellmarks_action.py"
+        ),
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+plugin = load_plugin()
+
+
+def execute_command(command: str) -> dict[str, Any]:
+    result = subprocess.run(command, shell=True, capture_output=True, text=True)
+    return {"rc": result.returncode, "stdout": result.stdout}
+
+
+class TestActionPlugin:
+    def create_action(self, args: dict[str, Any], check_mode: bool = False) -> Any:
+        task = mock.MagicMock()
+        task.args = args
+        task.async_val = 0
+        task.check_mode = check_mode
+        connection = mock.MagicMock()
+        connection._shell.tmpdir = "/tmp/remote"
+        action = plugin.ActionModule(
+            task, connection, mock.MagicMock(), None, None, None
+        )
+        action._remote_expand_user = lambda path: path
+        action._low_level_execute_command = execute_command
+        action._remove_tmp_path = mock.MagicMock()
+        action._execute_module = mock.MagicMock(return_value={"changed": False})
+        return action
+
+    def run(self, action: Any) -> dict[str, Any]:
+        return action.run(task_vars={"inventory_hostname": "host1"})
+
+    def test_skip_second_run(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        args = {"sdirs": sdirs, "mark": "dir1", "path": DIR1}
+        with mock.patch.object(plugin, "CACHE_DIR", tmp_dir()):
+            first = self.create_action(args)
+            self.run(first)
+            first._execute_module.assert_called_once()
+
+            second = self.create_action(args)
+            assert self.run(second) == {"changed": False}
+            second._execute_module.assert_not_called()
+
+            # The file was changed by someone else.
+            with open(sdirs, "a") as sdirs_file:
+                sdirs_file.write('export DIR_dir2="{}"\n'.format(DIR1))
+            third = self.create_action(args)
+            self.run(third)
+            third._execute_module.assert_called_once()
+
+            # Different arguments.
+            fourth = self.create_action(dict(args, sorted=False))
+            self.run(fourth)
+            fourth._execute_module.assert_called_once()
+
+    def test_digest(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="/"\n')
+        action = self.create_action({})
+        with open(sdirs, "rb") as sdirs_file:
+            expected = hashlib.sha256(sdirs_file.read()).hexdigest()
+        assert action._remote_digest(sdirs) == expected
+        assert action._remote_digest("/xxx/sdirs") is None
+
+    def test_uncacheable(self) -> None:
+        sdirs = create_tmp_text_file_with_content("")
+        args = {"sdirs": sdirs, "cleanup": True}
+        with mock.patch.object(plugin, "CACHE_DIR", tmp_dir()):
+            for _ in range(2):
+                action = self.create_action(args)
+                self.run(action)
+                action._execute_module.assert_called_once()
+
+    def test_check_mode_changed(self) -> None:
+        sdirs = create_tmp_text_file_with_content("")
+        args = {"sdirs": sdirs, "mark": "dir1", "path": DIR1}
+        with mock.patch.object(plugin, "CACHE_DIR", tmp_dir()):
+            for _ in range(2):
+                action = self.create_action(args, check_mode=True)
+                action._execute_module.return_value = {"changed": True}
+                assert self.run(action) == {"changed": True}
+                action._execute_module.assert_called_once()
+
+    def test_removed_directory(self) -> None:
+        directory = tmp_dir()
+        sdirs = create_tmp_text_file_with_content(
+            'export DIR_dir1="{}"\n'.format(directory)
+        )
+        args = {
+            "sdirs": sdirs,
+            "marks": [{"mark": "dir1", "path": directory}],
+        }
+        with mock.patch.object(plugin, "CACHE_DIR", tmp_dir()):
+            first = self.create_action(args)
+            self.run(first)
+            first._execute_module.assert_called_once()
+
+            second = self.create_action(args)
+            self.run(second)
+            second._execute_module.assert_not_called()
+
+            # The module would fail with NoPathError.
+            os.rmdir(directory)
+            third = self.create_action(args)
+            self.run(third)
+            third._execute_module.assert_called_once()
+
+    def test_present_paths(self) -> None:
+        assert plugin.present_paths({"path": "/a b", "state": "present"}) == ["'/a b'"]
+        assert plugin.present_paths({"path": "$HOME/a b"}) == ["\"$HOME\"'/a b'"]
+        assert plugin.present_paths({"path": "~"}) == ["\"$HOME\"''"]
+        assert plugin.present_paths({"path": "/a", "state": "absent"}) == []
+        assert plugin.present_paths({"marks": [{"mark": "a", "path": "a"}]}) is None
+
+    def test_home_directory(self) -> None:
+        action = self.create_action({})
+        sdirs = create_tmp_text_file_with_content("")
+        assert action._remote_digest(sdirs, ["\"$HOME\"''"]) is not None
+        assert action._remote_digest(sdirs, ["\"$HOME\"'/xxx/yyy'"]) is None
@@ -32,6 +32,18 @@ class TestClassEntry:
         assert entry.mark == "test"
         assert entry.path == "{}/tmp".format(HOME_DIR)
 
+    def test_init_home_dir(self) -> None:
+        entry = Entry(mark="test", path="~/tmp", validate=False, home_dir="/home/x")
+        assert entry.path == "/home/x/tmp"
+        assert (
+            entry.to_export_string(replace_home=True) == 'export DIR_test="$HOME/tmp"'
+        )
+
+    def test_slots(self) -> None:
+        entry = Entry(mark="test", path="/tmp", home_dir=HOME_DIR)
+        assert not hasattr(entry, "__dict__")
+        assert entry._home_dir is HOME_DIR  # type: ignore
+
     def test_init_exception_all_parameters(self) -> None:
         with pytest.raises(ValueError) as e:
             Entry(path="p", mark="m", entry="e")
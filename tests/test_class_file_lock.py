@@ -0,0 +1,21 @@
+import pytest
+
+from shellmarks import FileLock, LockTimeoutError
+
+from ._helper import tmp_file
+
+
+class TestClassFileLock:
+    def test_exclusive(self) -> None:
+        path = tmp_file()
+        with FileLock(path):
+            with pytest.raises(LockTimeoutError, match="couldn’t be acquired"):
+                with FileLock(path, timeout=0.1):
+                    pass
+
+    def test_release(self) -> None:
+        path = tmp_file()
+        with FileLock(path):
+            pass
+        with FileLock(path, timeout=0):
+            pass
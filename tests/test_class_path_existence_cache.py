@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+from unittest import mock
+
+import pytest
+
+from shellmarks import PathExistenceCache, ShellmarkManager
+
+from ._helper import DIR1, DIR2, DIR3, TEST_PATH, tmp_dir
+
+
+class TestClassPathExistenceCache:
+    def test_exists(self) -> None:
+        cache = PathExistenceCache()
+        assert cache.exists(DIR1)
+        assert cache.exists(TEST_PATH)
+        assert not cache.exists(os.path.join(TEST_PATH, "xxx"))
+        assert not cache.exists("/xxx/yyy/zzz")
+        assert not cache.exists(os.path.join(TEST_PATH, "sdirs", "xxx"))
+        assert cache.exists("/")
+
+    def test_exists_relative(self) -> None:
+        cache = PathExistenceCache()
+        assert cache.exists("tests")
+        assert cache.exists(os.path.join("tests", "files", "dir1"))
+        assert not cache.exists("xxx")
+
+    def test_exists_symlink(self) -> None:
+        directory = tmp_dir()
+        os.symlink(DIR1, os.path.join(directory, "valid"))
+        os.symlink("/xxx/yyy", os.path.join(directory, "dangling"))
+        cache = PathExistenceCache()
+        assert cache.exists(os.path.join(directory, "valid"))
+        assert not cache.exists(os.path.join(directory, "dangling"))
+
+    def test_one_scandir_per_directory(self) -> None:
+        cache = PathExistenceCache()
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            for path in (DIR1, DIR2, DIR3, os.path.join(TEST_PATH, "xxx")):
+                cache.exists(path)
+        assert scandir.call_count == 1
+
+    def test_shared_by_manager(self) -> None:
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
+            manager.add_entry(mark="dir4", path=DIR1)
+            manager.cleanup()
+        assert scandir.call_count == 1
+
+    def test_exists_unlisted(self) -> None:
+        # Thread IDs aren’t listed in /proc, but /proc/<tid> exists.
+        cache = PathExistenceCache()
+        with mock.patch.object(PathExistenceCache, "_scan", return_value=set()):
+            assert cache.exists(DIR1)
+            assert not cache.exists(os.path.join(TEST_PATH, "xxx"))
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+    def test_exists_proc_thread(self) -> None:
+        paths: list[str] = []
+
+        def thread() -> None:
+            paths.append("/proc/{}".format(threading.get_native_id()))
+            assert os.path.exists(paths[0])
+            assert PathExistenceCache().exists(paths[0])
+
+        worker = threading.Thread(target=thread)
+        worker.start()
+        worker.join()
+        assert len(paths) == 1
+
+    def test_exists_null_byte(self) -> None:
+        cache = PathExistenceCache()
+        assert not cache.exists("/tmp/a\0b/c")
+        assert not cache.exists("/tmp/a\0b")
+        assert cache.exists("/tmp")
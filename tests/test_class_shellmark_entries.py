@@ -1,10 +1,27 @@
 import os
+import pwd
+from unittest import mock
 
 import pytest
 
-from shellmarks import MarkInvalidError, ShellmarkManager
-
-from ._helper import DIR1, DIR2, DIR3, TEST_PATH, tmp_file
+from shellmarks import (
+    Entry,
+    MarkInvalidError,
+    SdirsSyntaxError,
+    ShellmarkManager,
+    get_home_dir,
+    parse_sdirs,
+)
+
+from ._helper import (
+    DIR1,
+    DIR2,
+    DIR3,
+    HOME_DIR,
+    TEST_PATH,
+    create_tmp_text_file_with_content,
+    tmp_file,
+)
 
 
 class TestClassShellmarkEntries:
@@ -17,18 +34,72 @@ class TestClassShellmarkEntries:
         assert manager._index["marks"]["dir2"] == [1]  # type: ignore
         assert manager._index["marks"]["dir3"] == [2]  # type: ignore
 
+    def test_init_malformed_lines(self) -> None:
+        sdirs = create_tmp_text_file_with_content(
+            'export DIR_dir1="/dir1"\n\nlol\nexport DIR_dir2="/dir2"\nexport\n'
+        )
+        with pytest.raises(SdirsSyntaxError) as e:
+            ShellmarkManager(path=sdirs)
+        assert e.value.args[0] == "Malformed lines in the bookmark file: 3, 5."
+
+    def test_function_parse_sdirs(self) -> None:
+        assert parse_sdirs(['export DIR_dir1="/dir1"\n', "\n", 'export DIR_d="/"']) == [
+            ("dir1", "/dir1"),
+            ("d", "/"),
+        ]
+
     def test_init_non_existent_file(self) -> None:
         manager = ShellmarkManager(path=os.path.join("tests", "xxx"))
         assert len(manager.entries) == 0
         assert len(manager._index["marks"]) == 0  # type: ignore
         assert len(manager._index["paths"]) == 0  # type: ignore
 
+    def test_init_one_passwd_lookup(self) -> None:
+        get_home_dir.cache_clear()
+        with mock.patch("pwd.getpwuid", wraps=pwd.getpwuid) as getpwuid:
+            manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
+            manager.add_entry(mark="dir4", path=DIR1)
+            manager.cleanup()
+        assert getpwuid.call_count == 1
+        assert manager.home_dir == HOME_DIR
+
+    def test_init_home_dir(self) -> None:
+        manager = ShellmarkManager(path=tmp_file(), home_dir="/home/x")
+        manager.add_entry(mark="tmp", path="~/tmp", validate=False)
+        assert manager.entries[0].path == "/home/x/tmp"
+
     def test_property_changed(self) -> None:
         manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
         assert not manager.changed
         manager.add_entry(mark="dir1", path=DIR1)
         assert manager.changed
 
+    def test_property_changed_cached(self) -> None:
+        manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
+        with mock.patch.object(
+            ShellmarkManager,
+            "_digest",
+            autospec=True,
+            side_effect=ShellmarkManager._digest,  # type: ignore
+        ) as digest:
+            assert not manager.changed
+            assert not manager.changed
+            assert digest.call_count == 1
+
+            manager.sort(reverse=True)
+            assert manager.changed
+            assert manager.changed
+            assert digest.call_count == 2
+
+            manager.sort()
+            assert not manager.changed
+            assert digest.call_count == 3
+
+            # The rendered content depends on the location of the repository.
+            manager.replace_home = True
+            manager.changed
+            assert digest.call_count == 4
+
     def test_property_changes(self) -> None:
         manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
         assert manager.changes == []
@@ -66,21 +137,27 @@ class TestClassShellmarkEntries:
         #     entries._store_index_number("lol", "downloads", 1)
         # self.assertEqual(str(cm.exception), "attribute_name “lol” unkown.")
 
-    def test_method__update_index(self) -> None:
+    def test_method__remove_index_number(self) -> None:
         manager = ShellmarkManager(path=tmp_file())
-        manager.add_entry(mark="dir1", path=DIR1)
-        assert manager._index["marks"]["dir1"] == [0]  # type: ignore
-        assert manager._index["paths"][DIR1] == [0]  # type: ignore
+        manager._store_index_number("mark", "downloads", 5)  # type: ignore
+        manager._store_index_number("mark", "downloads", 7)  # type: ignore
+        manager._remove_index_number("mark", "downloads", 5)  # type: ignore
+        assert manager._index["marks"]["downloads"] == [7]  # type: ignore
+        manager._remove_index_number("mark", "downloads", 7)  # type: ignore
+        assert "downloads" not in manager._index["marks"]  # type: ignore
 
-        # Delete the index store.
-        delattr(manager, "_index")
-        with pytest.raises(AttributeError):
-            getattr(manager, "_index")
+    def test_index_stable_ids_after_delete(self) -> None:
+        manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
+        manager.delete_entries(mark="dir1")
+        assert "dir1" not in manager._index["marks"]  # type: ignore
+        assert DIR1 not in manager._index["paths"]  # type: ignore
+        assert manager._index["marks"]["dir2"] == [1]  # type: ignore
+        assert manager._index["marks"]["dir3"] == [2]  # type: ignore
+        assert manager.get_entries(mark="dir3")[0].path == DIR3
+        assert manager.entries[0].mark == "dir2"
 
-        # Regenerate index.
-        manager._update_index()  # type: ignore
-        assert manager._index["marks"]["dir1"] == [0]  # type: ignore
-        assert manager._index["paths"][DIR1] == [0]  # type: ignore
+        assert manager.add_entry(mark="dir1", path=DIR1) == 2
+        assert manager._index["marks"]["dir1"] == [3]  # type: ignore
 
     def test_method__get_indexes(self) -> None:
         manager = ShellmarkManager(path=os.path.join("tests", "files", "sdirs"))
@@ -215,6 +292,7 @@ class TestClassShellmarkEntries:
         manager.update_entries(old_mark="dir1", new_mark="new1")
         result = manager.get_entries(mark="new1")
         assert result[0].path == DIR1
+        assert "dir1" not in manager._index["marks"]  # type: ignore
 
     def test_method_update_entries_duplicates(self) -> None:
         manager = ShellmarkManager(path=tmp_file())
@@ -278,6 +356,21 @@ class TestClassShellmarkEntries:
         assert manager.entries[1].mark == "mark1"
         assert manager.entries[1].path == DIR2
 
+    def test_method_delete_duplicates_changes(self) -> None:
+        manager = ShellmarkManager(path=tmp_file())
+        manager.add_entry(mark="mark1", path=DIR1)
+        manager.add_entry(mark="mark2", path=DIR1)
+        manager.add_entry(mark="mark2", path=DIR2)
+        manager.add_entry(mark="mark3", path=DIR2)
+        manager.delete_duplicates(marks=True, paths=True)
+        assert [entry.mark for entry in manager.entries] == ["mark3"]
+        assert manager.changes == [
+            {"action": "delete", "mark": "mark1", "path": DIR1},
+            {"action": "delete", "mark": "mark2", "path": DIR1},
+            {"action": "delete", "mark": "mark2", "path": DIR2},
+            {"action": "delete_duplicates", "count": 3},
+        ]
+
     def test_method_sort(self) -> None:
         sdirs = tmp_file()
         manager = ShellmarkManager(path=sdirs)
@@ -311,6 +404,73 @@ class TestClassShellmarkEntries:
         assert manager.entries[1].path == DIR2
         assert manager.entries[2].path == DIR1
 
+    def test_method_sort_already_sorted(self) -> None:
+        sdirs = tmp_file()
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.add_entry(mark="dir2", path=DIR2)
+        manager.changes = []
+        with mock.patch.object(manager, "_set_entries") as set_entries:
+            manager.sort()
+            manager.sort()
+        set_entries.assert_not_called()
+        assert manager.changes == []
+
+    def test_method_sort_merge_new_entries(self) -> None:
+        sdirs = tmp_file()
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.add_entry(mark="dir3", path=DIR3)
+        manager.sort()
+        manager.add_entry(mark="dir4", path=DIR1)
+        manager.add_entry(mark="dir2", path=DIR2)
+        manager.changes = []
+        manager.sort()
+        assert [entry.mark for entry in manager.entries] == [
+            "dir1",
+            "dir2",
+            "dir3",
+            "dir4",
+        ]
+        assert manager.changes == [
+            {"action": "sort", "sort_by": "mark", "reverse": False}
+        ]
+
+    def test_method_sort_after_update(self) -> None:
+        sdirs = tmp_file()
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.add_entry(mark="dir2", path=DIR2)
+        manager.sort()
+        manager.update_entries(old_mark="dir1", new_mark="dir3")
+        manager.sort()
+        assert [entry.mark for entry in manager.entries] == ["dir2", "dir3"]
+
+    def test_method_reconcile_only_added(self) -> None:
+        sdirs = tmp_file()
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.changes = []
+        with mock.patch.object(manager, "_set_entries") as set_entries:
+            manager.reconcile([("dir1", DIR1), ("dir2", DIR2)])
+        set_entries.assert_not_called()
+        assert [entry.mark for entry in manager.entries] == ["dir1", "dir2"]
+        assert manager.changes == [
+            {"action": "reconcile", "added": ["dir2"], "removed": [], "updated": []}
+        ]
+
+    def test_method__chunk_paths(self) -> None:
+        chunk_paths = ShellmarkManager._chunk_paths  # type: ignore
+        paths = ["/a", "/b", "/c"]
+        assert chunk_paths("cmd %paths", paths, 2, 100000) == [["/a", "/b"], ["/c"]]
+        assert chunk_paths("cmd %paths", paths, 100, 100000) == [paths]
+        # cmd: 4 + 8, %paths: 7 + 8, each path: 3 + 8
+        assert chunk_paths("cmd %paths", paths, 100, 27 + 22) == [
+            ["/a", "/b"],
+            ["/c"],
+        ]
+        assert chunk_paths("cmd %paths", [], 100, 100000) == []
+
     def test_method_write(self) -> None:
         old_path = os.path.join("tests", "files", "sdirs")
         manager = ShellmarkManager(path=old_path)
@@ -319,6 +479,78 @@ class TestClassShellmarkEntries:
         new_path_content = open(new_path, "r").read()
         assert new_path_content
 
+    def test_method_write_unchanged(self) -> None:
+        manager = ShellmarkManager(path=tmp_file())
+        manager.add_entry(mark="dir1", path=DIR1)
+        assert manager.write()
+        inode = os.stat(manager.path).st_ino
+        assert not manager.write()
+        assert os.stat(manager.path).st_ino == inode
+
+    def test_method_write_atomic(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir2="{}"\n'.format(DIR2))
+        os.chmod(sdirs, 0o640)
+        manager = ShellmarkManager(path=sdirs)
+        manager.delete_entries(mark="dir2")
+        manager.add_entry(mark="dir1", path=DIR1)
+        inode = os.stat(sdirs).st_ino
+        assert manager.write()
+        assert os.stat(sdirs).st_ino != inode
+        assert os.stat(sdirs).st_mode & 0o777 == 0o640
+        assert manager.get_raw() == 'export DIR_dir1="{}"\n'.format(DIR1)
+        # No temporary files are left behind.
+        directory, name = os.path.split(sdirs)
+        assert not [f for f in os.listdir(directory) if f.startswith("." + name)]
+
+    def test_method_write_symlink(self) -> None:
+        sdirs = tmp_file()
+        link = tmp_file()
+        os.unlink(link)
+        os.symlink(sdirs, link)
+        manager = ShellmarkManager(path=link)
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.write()
+        assert os.path.islink(link)
+        assert open(sdirs).read() == 'export DIR_dir1="{}"\n'.format(DIR1)
+
+    def test_method_write_append(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        inode = os.stat(sdirs).st_ino
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir2", path=DIR2)
+        with mock.patch("os.replace") as replace:
+            assert manager.write()
+        replace.assert_not_called()
+        assert os.stat(sdirs).st_ino == inode
+        assert (
+            manager.get_raw()
+            == 'export DIR_dir1="{}"\nexport DIR_dir2="{}"\n'.format(DIR1, DIR2)
+        )
+
+    def test_method_write_append_file_modified(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir2", path=DIR2)
+        with open(sdirs, "a") as sdirs_file:
+            sdirs_file.write('export DIR_dir3="{}"\n'.format(DIR3))
+        with mock.patch("os.replace", wraps=os.replace) as replace:
+            assert manager.write()
+        replace.assert_called_once()
+        assert (
+            manager.get_raw()
+            == 'export DIR_dir1="{}"\nexport DIR_dir2="{}"\n'.format(DIR1, DIR2)
+        )
+
+    def test_method_write_append_not_canonical(self) -> None:
+        sdirs = create_tmp_text_file_with_content(
+            'export DIR_dir1="{}/"\n'.format(DIR1)
+        )
+        manager = ShellmarkManager(path=sdirs)
+        manager.add_entry(mark="dir2", path=DIR2)
+        with mock.patch("os.replace", wraps=os.replace) as replace:
+            assert manager.write()
+        replace.assert_called_once()
+
     def test_combinations(self) -> None:
         manager = ShellmarkManager(path=tmp_file())
         manager.add_entry(mark="dir1", path=DIR1)
@@ -347,3 +579,119 @@ class TestClassShellmarkEntries:
                 TEST_PATH
             )
         )
+
+
+class TestTupleEntries:
+    """Entries loaded without validation are stored as tuples."""
+
+    def create_sdirs_file(self) -> str:
+        return create_tmp_text_file_with_content(
+            'export DIR_dir1="{}"\n'
+            'export DIR_dir2="$HOME/xxx"\n'
+            'export DIR_dir3="tests/files/dir3"\n'
+            'export DIR_dir4="{}/"\n'.format(DIR1, DIR2)
+        )
+
+    def load(self, sdirs: str) -> ShellmarkManager:
+        return ShellmarkManager(path=sdirs, validate_on_init=False)
+
+    def test_same_as_entry_objects(self) -> None:
+        sdirs = self.create_sdirs_file()
+        with mock.patch.object(
+            ShellmarkManager, "_normalize_path_fast", return_value=None
+        ):
+            objects = self.load(sdirs)
+        tuples = self.load(sdirs)
+        assert [entry.to_dict() for entry in tuples.entries] == [
+            entry.to_dict() for entry in objects.entries
+        ]
+        assert tuples._index == objects._index  # type: ignore
+
+    def test_materialize_on_demand(self) -> None:
+        sdirs = self.create_sdirs_file()
+        manager = self.load(sdirs)
+        stored = list(manager._entries.values())  # type: ignore
+        assert stored[0] == ("dir1", DIR1)
+        assert stored[1] == ("dir2", HOME_DIR + "/xxx")
+        # The relative path and the path with a trailing slash depend on the
+        # file system.
+        assert isinstance(stored[2], Entry)
+        assert isinstance(stored[3], Entry)
+
+        assert manager.get_entries(mark="dir1")[0].path == DIR1
+        assert isinstance(manager._entries[0], Entry)  # type: ignore
+        assert isinstance(manager._entries[1], tuple)  # type: ignore
+
+    def test_no_tuples_with_validation(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        manager = ShellmarkManager(path=sdirs, validate_on_init=True)
+        assert isinstance(manager._entries[0], Entry)  # type: ignore
+
+    def test_changed_and_write(self) -> None:
+        sdirs = create_tmp_text_file_with_content(
+            'export DIR_dir1="{}"\nexport DIR_dir2="{}"\n'.format(DIR1, DIR2)
+        )
+        manager = self.load(sdirs)
+        assert not manager.changed
+        manager.delete_entries(mark="dir1")
+        manager.add_entry(mark="dir3", path=DIR3)
+        manager.sort(reverse=True)
+        assert manager.changed
+        manager.write()
+        assert (
+            manager.get_raw()
+            == 'export DIR_dir3="{}"\nexport DIR_dir2="{}"\n'.format(DIR3, DIR2)
+        )
+
+    def test_empty_file(self) -> None:
+        manager = self.load(tmp_file())
+        assert manager.entries == []
+        assert not manager.changed
+
+
+class TestIndexCache:
+    def create_sdirs_file(self) -> str:
+        return create_tmp_text_file_with_content(
+            'export DIR_dir1="{}"\nexport DIR_dir2="$HOME/xxx"\n'.format(DIR1)
+        )
+
+    def load(self, sdirs: str) -> ShellmarkManager:
+        return ShellmarkManager(
+            path=sdirs, validate_on_init=False, index_path=sdirs + ".idx"
+        )
+
+    def test_warm_load(self) -> None:
+        sdirs = self.create_sdirs_file()
+        cold = self.load(sdirs)
+        assert os.path.exists(sdirs + ".idx")
+        with mock.patch("shellmarks.parse_sdirs") as parse:
+            warm = self.load(sdirs)
+        parse.assert_not_called()
+        assert warm._entries == cold._entries  # type: ignore
+        assert warm._index == cold._index  # type: ignore
+        assert warm.changed == cold.changed
+        assert warm.get_entries(mark="dir2")[0].path == HOME_DIR + "/xxx"
+
+    def test_stale_cache_is_rebuilt(self) -> None:
+        sdirs = self.create_sdirs_file()
+        self.load(sdirs)
+        with open(sdirs, "a") as sdirs_file:
+            sdirs_file.write('export DIR_dir3="{}"\n'.format(DIR3))
+        manager = self.load(sdirs)
+        assert [entry.mark for entry in manager.entries] == ["dir1", "dir2", "dir3"]
+        with mock.patch("shellmarks.parse_sdirs") as parse:
+            assert len(self.load(sdirs).entries) == 3
+        parse.assert_not_called()
+
+    def test_corrupt_cache(self) -> None:
+        sdirs = self.create_sdirs_file()
+        with open(sdirs + ".idx", "wb") as index:
+            index.write(b"SDIRSIDX corrupt")
+        assert len(self.load(sdirs).entries) == 2
+
+    def test_no_cache_for_file_system_dependent_paths(self) -> None:
+        sdirs = create_tmp_text_file_with_content(
+            'export DIR_dir3="tests/files/dir3"\n'
+        )
+        self.load(sdirs)
+        assert not os.path.exists(sdirs + ".idx")
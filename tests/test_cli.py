@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from shellmarks import ShellmarkManager, cli
+
+from ._helper import DIR1, DIR2, DIR3, HOME_DIR, create_sdirs, read, tmp_file
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        encoding="utf-8",
+        cwd=PROJECT_PATH,
+    )
+
+
+class TestCli:
+    def test_add(self) -> None:
+        sdirs = tmp_file()
+        assert cli(["--sdirs", sdirs, "add", "dir2", DIR2]) == 0
+        assert cli(["--sdirs", sdirs, "add", "dir1", DIR1]) == 0
+        assert [entry.mark for entry in ShellmarkManager(sdirs).entries] == [
+            "dir1",
+            "dir2",
+        ]
+
+    def test_add_nonexistent_path(self, capsys: pytest.CaptureFixture[str]) -> None:
+        sdirs = tmp_file()
+        assert cli(["--sdirs", sdirs, "add", "dir1", "/xxx"]) == 1
+        assert "doesn’t exist" in capsys.readouterr().err
+        assert read(sdirs) == []
+
+    def test_rm(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        assert cli(["--sdirs", manager.path, "rm", "dir1"]) == 0
+        assert cli(["--sdirs", manager.path, "rm", "--path", DIR2]) == 0
+        assert read(manager.path) == []
+
+    def test_rm_home(self) -> None:
+        manager = create_sdirs([("home", HOME_DIR)])
+        assert cli(["--sdirs", manager.path, "rm", "--path", "~"]) == 0
+        assert read(manager.path) == []
+
+    @pytest.mark.parametrize("path", [DIR2, "/xxx"])
+    def test_rm_mismatch(self, path: str, capsys: pytest.CaptureFixture[str]) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        assert cli(["--sdirs", manager.path, "rm", "dir1", "--path", path]) == 1
+        assert "didn’t match" in capsys.readouterr().err
+        assert len(read(manager.path)) == 2
+
+    def test_ls(self, capsys: pytest.CaptureFixture[str]) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        assert cli(["--sdirs", manager.path, "ls"]) == 0
+        assert capsys.readouterr().out == "dir1\t{}\ndir2\t{}\n".format(DIR1, DIR2)
+
+    def test_cleanup(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("xxx", "/xxx")])
+        assert cli(["--sdirs", manager.path, "cleanup"]) == 0
+        assert [entry.mark for entry in ShellmarkManager(manager.path).entries] == [
+            "dir1"
+        ]
+
+    def test_dedup(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir1", DIR2), ("dir3", DIR3)])
+        assert cli(["--sdirs", manager.path, "--no-sort", "dedup"]) == 0
+        assert len(read(manager.path)) == 2
+
+    def test_export(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        assert cli(["--sdirs", manager.path, "export", "true %path"]) == 0
+        assert len(read(manager.path)) == 1
+
+
+class TestModuleExecution:
+    def test_python_m(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        result = run("-m", "shellmarks", "--sdirs", manager.path, "ls")
+        assert result.returncode == 0
+        assert result.stdout == "dir1\t{}\n".format(DIR1)
+
+    @pytest.mark.skipif(not hasattr(os, "openpty"), reason="No pseudo terminal")
+    def test_terminal_without_arguments(self) -> None:
+        primary, secondary = os.openpty()
+        try:
+            result = subprocess.run(
+                [sys.executable, "-m", "shellmarks"],
+                stdin=secondary,
+                capture_output=True,
+                encoding="utf-8",
+                cwd=PROJECT_PATH,
+                timeout=30,
+            )
+        finally:
+            os.close(primary)
+            os.close(secondary)
+        assert result.returncode == 2
+        assert result.stderr.startswith("usage: python -m shellmarks")
+
+    def test_importtime(self) -> None:
+        """Importing the module and running the command line interface must
+        not import Ansible."""
+        sdirs = tmp_file()
+        result = run("-X", "importtime", "-m", "shellmarks", "--sdirs", sdirs, "ls")
+        assert result.returncode == 0
+        modules = [line.split("|")[-1].strip() for line in result.stderr.splitlines()]
+        assert "argparse" in modules
+        assert not [module for module in modules if module.startswith("ansible")]
+
+        result = run("-X", "importtime", "-c", "import shellmarks")
+        cumulative = {
+            line.split("|")[-1].strip(): int(line.split("|")[1])
+            for line in result.stderr.splitlines()[1:]
+        }
+        assert not [module for module in cumulative if module.startswith("ansible")]
+        # Only needed by the command line interface, the profiler and the
+        # concurrent export.
+        for module in ("argparse", "cProfile", "concurrent.futures"):
+            assert module not in cumulative
+        # In microseconds, including the compilation of the module.
+        assert cumulative["shellmarks"] < 250_000
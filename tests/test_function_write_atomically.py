@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from shellmarks import write_atomically
+
+from ._helper import tmp_dir
+
+
+class TestWriteAtomically:
+    def test_write(self) -> None:
+        path = os.path.join(tmp_dir(), "file")
+        assert write_atomically(path, b"content")
+        with open(path, "rb") as written:
+            assert written.read() == b"content"
+        umask = os.umask(0)
+        os.umask(umask)
+        assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+    def test_preserve_mode(self) -> None:
+        path = os.path.join(tmp_dir(), "file")
+        write_atomically(path, b"old")
+        os.chmod(path, 0o600)
+        write_atomically(path, b"new", stat=os.stat(path))
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_missing_directory(self) -> None:
+        path = os.path.join(tmp_dir(), "xxx", "file")
+        assert not write_atomically(path, b"content", ignore_errors=True)
+        with pytest.raises(FileNotFoundError):
+            write_atomically(path, b"content")
+
+    def test_no_temporary_file_left(self) -> None:
+        directory = tmp_dir()
+        # A directory can’t be replaced by a file.
+        path = os.path.join(directory, "file")
+        os.mkdir(path)
+        assert not write_atomically(path, b"content", ignore_errors=True)
+        with pytest.raises(OSError):
+            write_atomically(path, b"content")
+        assert os.listdir(directory) == ["file"]
@@ -1,8 +1,17 @@
+import os
 from unittest import mock
 
+import shellmarks
 from shellmarks import ShellmarkManager
 
-from ._helper import DIR1, HOME_DIR, mock_main, read, tmp_file
+from ._helper import (
+    DIR1,
+    HOME_DIR,
+    create_tmp_text_file_with_content,
+    mock_main,
+    read,
+    tmp_file,
+)
 
 
 class TestErrors:
@@ -50,17 +59,64 @@ class TestErrors:
         )
 
 
+class TestMalformedFile:
+    def test_malformed_lines(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="/dir1"\nlol\n')
+        with mock.patch("ansible.module_utils.basic.AnsibleModule") as AnsibleModule:
+            module = AnsibleModule.return_value
+            module.params = {
+                "mark": None,
+                "path": None,
+                "sdirs": sdirs,
+                "index_cache": False,
+                "locking": "none",
+                "profile": False,
+                "profile_output": None,
+            }
+            shellmarks.main()
+        module.fail_json.assert_called_with(
+            msg="Malformed lines in the bookmark file: 2."
+        )
+        module.exit_json.assert_not_called()
+
+
+class TestIndexCache:
+    def test_index_cache(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        mock_main({"sdirs": sdirs, "index_cache": True}, check_mode=False)
+        assert os.path.exists(sdirs + ".idx")
+
+    def test_check_mode(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        mock_main({"sdirs": sdirs, "index_cache": True}, check_mode=True)
+        assert not os.path.exists(sdirs + ".idx")
+
+
 class TestParams:
     def test_mock(self) -> None:
         sdirs = tmp_file()
         result = mock_main(
             {
                 "cleanup": False,
+                "cleanup_keep_timed_out": True,
+                "cleanup_timeout": None,
+                "cleanup_workers": 1,
                 "delete_duplicates": False,
+                "exclusive": False,
                 "export": None,
+                "export_batch_size": 100,
                 "export_check": None,
+                "export_ledger": False,
+                "export_list": None,
+                "export_workers": 1,
+                "index_cache": False,
+                "lock_timeout": 10.0,
+                "locking": "none",
                 "mark": "dir1",
+                "marks": None,
                 "path": DIR1,
+                "profile": False,
+                "profile_output": None,
                 "replace_home": True,
                 "sdirs": sdirs,
                 "sorted": False,
@@ -71,11 +127,33 @@ class TestParams:
 
         expected = dict(
             cleanup=dict(default=False, type="bool"),
+            cleanup_keep_timed_out=dict(default=True, type="bool"),
+            cleanup_timeout=dict(type="float"),
+            cleanup_workers=dict(default=1, type="int"),
             delete_duplicates=dict(default=False, type="bool"),
+            exclusive=dict(default=False, type="bool"),
             export=dict(type="str"),
+            export_batch_size=dict(default=100, type="int"),
             export_check=dict(type="str"),
+            export_ledger=dict(default=False, type="bool"),
+            export_list=dict(type="str"),
+            export_workers=dict(default=1, type="int"),
+            index_cache=dict(default=False, type="bool"),
+            lock_timeout=dict(default=10.0, type="float"),
+            locking=dict(default="none", choices=["exclusive", "optimistic", "none"]),
             mark=dict(aliases=["bookmark"]),
+            marks=dict(
+                type="list",
+                elements="dict",
+                options=dict(
+                    mark=dict(required=True, aliases=["bookmark"]),
+                    path=dict(aliases=["src"]),
+                    state=dict(default="present", choices=["present", "absent"]),
+                ),
+            ),
             path=dict(aliases=["src"]),
+            profile=dict(default=False, type="bool"),
+            profile_output=dict(type="str"),
             replace_home=dict(default=True, type="bool"),
             sdirs=dict(default="~/.sdirs"),
             sorted=dict(default=True, type="bool"),
@@ -0,0 +1,108 @@
+from unittest import mock
+
+import pytest
+
+import shellmarks
+from shellmarks import ModuleParams, is_already_present
+
+from ._helper import (
+    DIR1,
+    DIR2,
+    DIR3,
+    HOME_DIR,
+    create_tmp_text_file_with_content,
+    mock_main,
+)
+
+
+def params(sdirs: str, **kwargs: object) -> ModuleParams:
+    result: dict[str, object] = {
+        "cleanup": False,
+        "delete_duplicates": False,
+        "exclusive": False,
+        "export": None,
+        "mark": "dir2",
+        "marks": None,
+        "path": DIR2,
+        "replace_home": False,
+        "sdirs": sdirs,
+        "sorted": True,
+        "state": "present",
+    }
+    result.update(kwargs)
+    return result  # type: ignore
+
+
+def sdirs_file(*lines: str) -> str:
+    return create_tmp_text_file_with_content("".join(line + "\n" for line in lines))
+
+
+class TestAlreadyPresent:
+    def test_skip_loading(self) -> None:
+        sdirs = sdirs_file(
+            'export DIR_dir1="{}"'.format(DIR1),
+            'export DIR_dir2="{}"'.format(DIR2),
+            'export DIR_dir3="{}"'.format(DIR3),
+        )
+        with mock.patch("shellmarks.load_and_apply") as load_and_apply:
+            result = mock_main(
+                {"sdirs": sdirs, "mark": "dir2", "path": DIR2, "sorted": True}
+            )
+        load_and_apply.assert_not_called()
+        result.module.exit_json.assert_called_with(changed=False)
+
+    def test_fall_back(self) -> None:
+        sdirs = sdirs_file(
+            'export DIR_dir2="{}"'.format(DIR2),
+            'export DIR_dir1="{}"'.format(DIR1),
+        )
+        with mock.patch(
+            "shellmarks.load_and_apply", wraps=shellmarks.load_and_apply
+        ) as load_and_apply:
+            mock_main({"sdirs": sdirs, "mark": "dir2", "path": DIR2, "sorted": True})
+        load_and_apply.assert_called_once()
+
+    def test_present(self) -> None:
+        sdirs = sdirs_file(
+            'export DIR_dir1="{}"'.format(DIR1),
+            'export DIR_dir2="{}"'.format(DIR2),
+        )
+        assert is_already_present(params(sdirs), HOME_DIR)
+        assert is_already_present(params(sdirs, sorted=False), HOME_DIR)
+        assert not is_already_present(
+            params(sdirs, mark="dir1", path=DIR1, sorted=False), HOME_DIR
+        )
+
+    def test_replace_home(self) -> None:
+        # The home directory itself: The checkout may be outside of it.
+        sdirs = sdirs_file('export DIR_home="$HOME"')
+        home = {"mark": "home", "path": HOME_DIR}
+        assert is_already_present(params(sdirs, replace_home=True, **home), HOME_DIR)
+        assert not is_already_present(params(sdirs, **home), HOME_DIR)
+
+    @pytest.mark.parametrize(
+        "lines",
+        [
+            # unsorted
+            ('export DIR_dir2="{}"'.format(DIR2), 'export DIR_dir1="{}"'.format(DIR1)),
+            # duplicate mark
+            ('export DIR_dir2="{}"'.format(DIR1), 'export DIR_dir2="{}"'.format(DIR2)),
+            # duplicate path
+            ('export DIR_dir1="{}"'.format(DIR2), 'export DIR_dir2="{}"'.format(DIR2)),
+            # not normalized
+            ('export DIR_dir1="{}/"'.format(DIR1), 'export DIR_dir2="{}"'.format(DIR2)),
+            ('export DIR_dir1="tests"', 'export DIR_dir2="{}"'.format(DIR2)),
+            # blank line
+            ("", 'export DIR_dir2="{}"'.format(DIR2)),
+            # missing
+            ('export DIR_dir1="{}"'.format(DIR1),),
+        ],
+    )
+    def test_not_present(self, lines: tuple[str, ...]) -> None:
+        assert not is_already_present(params(sdirs_file(*lines)), HOME_DIR)
+
+    def test_other_operations(self) -> None:
+        sdirs = sdirs_file('export DIR_dir2="{}"'.format(DIR2))
+        assert not is_already_present(params(sdirs, cleanup=True), HOME_DIR)
+        assert not is_already_present(params(sdirs, export="echo %path"), HOME_DIR)
+        assert not is_already_present(params(sdirs, state="absent"), HOME_DIR)
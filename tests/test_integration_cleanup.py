@@ -1,4 +1,11 @@
-from shellmarks import ShellmarkManager
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from shellmarks import ShellmarkManager, check_paths
 
 from ._helper import (
     DIR1,
@@ -40,3 +47,120 @@ class TestCleanup:
         assert result.manager.entries[0].path == DIR1
 
         result.module.exit_json.assert_called_with(changed=False)
+
+    def test_cleanup_workers(self) -> None:
+        path = tmp_dir()
+        no = 'export DIR_tmpb="/tmpXDR34723df4WER/d4REd4RE64er64erb"\n'
+        content = no + 'export DIR_exists="' + path + '"\n' + no
+        sdirs = create_tmp_text_file_with_content(content)
+
+        result = mock_main({"cleanup": True, "cleanup_workers": 4, "sdirs": sdirs})
+        assert len(result.manager.entries) == 1
+        result.module.exit_json.assert_called_with(
+            changed=True, changes=[{"action": "cleanup", "count": 2}]
+        )
+
+
+HUNG_MOUNT = tmp_dir()
+"""A directory that simulates a hung NFS mount."""
+
+HUNG = os.path.join(HUNG_MOUNT, "dir")
+os.mkdir(HUNG)
+
+
+def exists_hung(self: object, path: str) -> bool:
+    if path.startswith(HUNG_MOUNT + os.sep):
+        time.sleep(0.5)
+    return os.path.isdir(path)
+
+
+class TestCleanupTimeout:
+    def create_sdirs_file(self) -> str:
+        manager = ShellmarkManager(path=tmp_file())
+        manager.add_entry(mark="dir1", path=DIR1)
+        manager.add_entry(mark="hung", path=HUNG)
+        manager.add_entry(mark="dir3", path=DIR3)
+        manager.write()
+        return manager.path
+
+    def test_check_paths(self) -> None:
+        results = check_paths(
+            [DIR1, HUNG, DIR3, "/xxx"],
+            workers=1,
+            timeout=0.1,
+            exists=lambda path: exists_hung(None, path),
+        )
+        assert results == {DIR1: True, HUNG: None, DIR3: True, "/xxx": False}
+
+    def test_check_paths_hung_directory(self) -> None:
+        paths = [os.path.join(HUNG_MOUNT, str(number)) for number in range(20)]
+        threads = threading.active_count()
+        start = time.monotonic()
+        results = check_paths(
+            [DIR1] + paths + [DIR3],
+            workers=2,
+            timeout=0.2,
+            exists=lambda path: exists_hung(None, path),
+        )
+        # One timeout per hung directory, not one per path.
+        assert time.monotonic() - start < 1.0
+        assert results == dict({DIR1: True, DIR3: True}, **dict.fromkeys(paths))
+        # At most one worker per concurrent check is abandoned.
+        assert threading.active_count() - threads <= 2
+
+    def test_check_paths_error(self) -> None:
+        def exists(path: str) -> bool:
+            if path == "/xxx":
+                raise OSError("Input/output error")
+            return os.path.exists(path)
+
+        for workers in (1, 2):
+            results = check_paths([DIR1, "/xxx", DIR2], workers=workers, exists=exists)
+            assert results == {DIR1: True, "/xxx": False, DIR2: True}
+
+    def test_check_paths_null_byte(self) -> None:
+        for workers in (1, 2):
+            results = check_paths(["/tmp", "/tmp/a\0b/c"], workers=workers)
+            assert results == {"/tmp": True, "/tmp/a\0b/c": False}
+
+    def test_check_paths_unexpected_error(self) -> None:
+        def exists(path: str) -> bool:
+            raise RuntimeError("bug")
+
+        with pytest.raises(RuntimeError):
+            check_paths([DIR1, DIR2, DIR3], workers=2, exists=exists)
+
+    def test_keep_timed_out(self) -> None:
+        sdirs = self.create_sdirs_file()
+        with mock.patch("shellmarks.PathExistenceCache.exists", exists_hung):
+            result = mock_main(
+                {"cleanup": True, "cleanup_timeout": 0.1, "sdirs": sdirs},
+                check_mode=True,
+            )
+        result.module.exit_json.assert_called_with(changed=False, timed_out=[HUNG])
+        assert len(result.manager.entries) == 3
+
+    def test_drop_timed_out(self) -> None:
+        sdirs = self.create_sdirs_file()
+        with mock.patch("shellmarks.PathExistenceCache.exists", exists_hung):
+            result = mock_main(
+                {
+                    "cleanup": True,
+                    "cleanup_timeout": 0.1,
+                    "cleanup_keep_timed_out": False,
+                    "sdirs": sdirs,
+                },
+            )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "cleanup",
+                    "count": 1,
+                    "timed_out": [HUNG],
+                    "timed_out_kept": False,
+                }
+            ],
+            timed_out=[HUNG],
+        )
+        assert len(result.manager.entries) == 2
@@ -0,0 +1,77 @@
+from ._helper import DIR1, DIR2, DIR3, create_sdirs, mock_main
+
+
+class TestExclusive:
+    def test_reconcile(self) -> None:
+        manager = create_sdirs(
+            [("dir1", DIR1), ("dir2", DIR1), ("old", DIR3), ("dir1", DIR2)]
+        )
+        result = mock_main(
+            params={
+                "sdirs": manager.path,
+                "exclusive": True,
+                "marks": [
+                    {"mark": "dir1", "path": DIR1, "state": "present"},
+                    {"mark": "dir2", "path": DIR2, "state": "present"},
+                    {"mark": "dir3", "path": DIR3, "state": "present"},
+                ],
+            }
+        )
+        assert [(entry.mark, entry.path) for entry in result.manager.entries] == [
+            ("dir1", DIR1),
+            ("dir2", DIR2),
+            ("dir3", DIR3),
+        ]
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "reconcile",
+                    "added": ["dir3"],
+                    "removed": ["old", "dir1"],
+                    "updated": ["dir2"],
+                },
+            ],
+        )
+
+    def test_unchanged(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        result = mock_main(
+            params={
+                "sdirs": manager.path,
+                "exclusive": True,
+                "mark": "dir2",
+                "path": DIR2,
+                "marks": [{"mark": "dir1", "path": DIR1, "state": "present"}],
+            }
+        )
+        result.module.exit_json.assert_called_with(changed=False)
+
+    def test_empty_list(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        result = mock_main(params={"sdirs": manager.path, "exclusive": True})
+        assert result.manager.entries == []
+
+    def test_missing_path(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        result = mock_main(
+            params={
+                "sdirs": manager.path,
+                "exclusive": True,
+                "marks": [{"mark": "dir2", "path": None, "state": "present"}],
+            }
+        )
+        result.module.fail_json.assert_called_with(
+            msg="The bookmark “dir2” has no path. In the exclusive mode every "
+            "bookmark needs a path."
+        )
+        assert len(result.manager.entries) == 1
+
+    def test_nonexistent_path(self) -> None:
+        result = mock_main(
+            params={
+                "exclusive": True,
+                "marks": [{"mark": "dir1", "path": "/xxx", "state": "present"}],
+            }
+        )
+        result.module.fail_json.assert_called_with(msg="The path “/xxx” doesn’t exist.")
@@ -0,0 +1,229 @@
+import json
+import os
+
+from shellmarks import OptionalModuleParams
+
+from ._helper import DIR1, DIR2, DIR3, TEST_PATH, create_sdirs, mock_main
+
+
+class TestExport:
+    @staticmethod
+    def create_sdirs_file() -> str:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2), ("dir3", DIR3)])
+        return manager.path
+
+    def test_export(self) -> None:
+        result = mock_main(
+            params={"sdirs": self.create_sdirs_file(), "export": "true %mark"}
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": ["true dir1", "true dir2", "true dir3"],
+                },
+            ],
+        )
+
+    def test_export_check(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "true %mark",
+                "export_check": "test %mark = dir2",
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "export", "export_commands": ["true dir1", "true dir3"]},
+            ],
+        )
+
+    def test_export_failed(self) -> None:
+        result = mock_main(
+            params={"sdirs": self.create_sdirs_file(), "export": "false %mark"}
+        )
+        result.module.exit_json.assert_called_with(changed=False)
+
+    def test_export_workers(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "sh -c 'sleep 0.05' %mark",
+                "export_workers": 3,
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": [
+                        "sh -c 'sleep 0.05' dir1",
+                        "sh -c 'sleep 0.05' dir2",
+                        "sh -c 'sleep 0.05' dir3",
+                    ],
+                },
+            ],
+        )
+
+    def test_export_list(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "true %mark",
+                "export_list": "echo {}".format(DIR2),
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "export", "export_commands": ["true dir1", "true dir3"]},
+            ],
+        )
+
+    def test_export_list_failed(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "true %mark",
+                "export_list": "false",
+                "export_check": "test %mark = dir3",
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "export", "export_commands": ["true dir1", "true dir2"]},
+            ],
+        )
+
+    def test_export_batch(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "true %paths",
+                "export_batch_size": 2,
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": [
+                        "true {} {}".format(DIR1, DIR2),
+                        "true {}".format(DIR3),
+                    ],
+                },
+            ],
+        )
+
+    def test_export_batch_check(self) -> None:
+        result = mock_main(
+            params={
+                "sdirs": self.create_sdirs_file(),
+                "export": "true %paths",
+                "export_check": "test %mark = dir1",
+            }
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": ["true {} {}".format(DIR2, DIR3)],
+                },
+            ],
+        )
+
+    def test_export_ledger(self) -> None:
+        sdirs = self.create_sdirs_file()
+        params: OptionalModuleParams = {
+            "sdirs": sdirs,
+            "export": "true %mark",
+            "export_ledger": True,
+        }
+        result = mock_main(params=dict(params))  # type: ignore
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": ["true dir1", "true dir2", "true dir3"],
+                },
+            ],
+        )
+        assert os.path.exists(sdirs + ".export")
+
+        result = mock_main(params=dict(params))  # type: ignore
+        result.module.exit_json.assert_called_with(changed=False)
+
+        result = mock_main(
+            params=dict(params, mark="tmp", path=TEST_PATH)  # type: ignore
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "add", "mark": "tmp", "path": TEST_PATH},
+                {"action": "export", "export_commands": ["true tmp"]},
+            ],
+        )
+
+    def test_export_ledger_failed(self) -> None:
+        sdirs = self.create_sdirs_file()
+        params: OptionalModuleParams = {
+            "sdirs": sdirs,
+            "export": "test %mark != dir2",
+            "export_ledger": True,
+        }
+        mock_main(params=dict(params))  # type: ignore
+        result = mock_main(params=dict(params))  # type: ignore
+        # Only the failed entry is exported again.
+        result.module.exit_json.assert_called_with(changed=False)
+        ledger = json.load(open(sdirs + ".export"))["test %mark != dir2"]
+        assert ledger["digest"] is None
+        assert ledger["entries"] == [["dir1", DIR1], ["dir3", DIR3]]
+
+    def test_export_ledger_corrupt(self) -> None:
+        sdirs = self.create_sdirs_file()
+        with open(sdirs + ".export", "w") as ledger_file:
+            json.dump({"true %mark": {"digest": None, "entries": [1, 2]}}, ledger_file)
+        result = mock_main(
+            params={"sdirs": sdirs, "export": "true %mark", "export_ledger": True}
+        )
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {
+                    "action": "export",
+                    "export_commands": ["true dir1", "true dir2", "true dir3"],
+                },
+            ],
+        )
+        ledger = json.load(open(sdirs + ".export"))["true %mark"]
+        assert len(ledger["entries"]) == 3
+
+    def test_export_ledger_check_mode(self) -> None:
+        sdirs = self.create_sdirs_file()
+        mock_main(
+            params={"sdirs": sdirs, "export": "true %mark", "export_ledger": True},
+            check_mode=True,
+        )
+        assert not os.path.exists(sdirs + ".export")
+
+    def test_export_ledger_unwritable(self) -> None:
+        sdirs = self.create_sdirs_file()
+        # The ledger path is a directory: It can’t be replaced.
+        os.mkdir(sdirs + ".export")
+        result = mock_main(
+            params={"sdirs": sdirs, "export": "true %mark", "export_ledger": True}
+        )
+        result.module.fail_json.assert_not_called()
+        # No temporary file is left behind.
+        prefix = "." + os.path.basename(sdirs) + ".export."
+        assert not any(
+            name.startswith(prefix) for name in os.listdir(os.path.dirname(sdirs))
+        )
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import shellmarks
+from shellmarks import FileLock
+
+from ._helper import DIR1, DIR2, DIR3, create_sdirs, mock_main, read
+
+
+class TestLocking:
+    def test_exclusive(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        result = mock_main(
+            {
+                "sdirs": manager.path,
+                "mark": "dir2",
+                "path": DIR2,
+                "locking": "exclusive",
+            }
+        )
+        assert len(read(manager.path)) == 2
+        result.module.fail_json.assert_not_called()
+
+    def test_exclusive_timeout(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        with FileLock(manager.path + ".lock"):
+            result = mock_main(
+                {
+                    "sdirs": manager.path,
+                    "mark": "dir2",
+                    "path": DIR2,
+                    "locking": "exclusive",
+                    "lock_timeout": 0.1,
+                }
+            )
+        assert len(read(manager.path)) == 1
+        result.module.fail_json.assert_called_once()
+        result.module.exit_json.assert_not_called()
+
+    def test_optimistic_reapply(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        apply_mark = shellmarks.apply_mark
+        calls: list[tuple[object, ...]] = []
+
+        def concurrent_apply_mark(*args: object) -> None:
+            # Another process adds a bookmark after the first load.
+            if not calls:
+                with open(manager.path, "a") as sdirs:
+                    sdirs.write('export DIR_dir3="{}"\n'.format(DIR3))
+            calls.append(args)
+            apply_mark(*args)  # type: ignore
+
+        with mock.patch("shellmarks.apply_mark", concurrent_apply_mark):
+            result = mock_main(
+                {
+                    "sdirs": manager.path,
+                    "mark": "dir2",
+                    "path": DIR2,
+                    "locking": "optimistic",
+                }
+            )
+        assert len(calls) == 2
+        assert [entry.mark for entry in result.manager.entries] == [
+            "dir1",
+            "dir3",
+            "dir2",
+        ]
+
+    def test_optimistic_unchanged(self) -> None:
+        manager = create_sdirs([("dir1", DIR1)])
+        result = mock_main(
+            {
+                "sdirs": manager.path,
+                "mark": "dir2",
+                "path": DIR2,
+                "locking": "optimistic",
+            }
+        )
+        assert len(read(manager.path)) == 2
+        result.module.exit_json.assert_called_once()
@@ -0,0 +1,74 @@
+from ._helper import DIR1, DIR2, DIR3, create_sdirs, mock_main, read
+
+
+class TestMarks:
+    def test_add_multiple(self) -> None:
+        result = mock_main(
+            params={
+                "marks": [
+                    {"mark": "dir1", "path": DIR1, "state": "present"},
+                    {"mark": "dir2", "path": DIR2, "state": "present"},
+                ]
+            }
+        )
+        assert len(result.manager.entries) == 2
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "add", "mark": "dir1", "path": DIR1},
+                {"action": "add", "mark": "dir2", "path": DIR2},
+            ],
+        )
+
+    def test_present_and_absent(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        result = mock_main(
+            params={
+                "sdirs": manager.path,
+                "marks": [
+                    {"mark": "dir3", "path": DIR3, "state": "present"},
+                    {"mark": "dir1", "path": None, "state": "absent"},
+                ],
+            }
+        )
+        assert [entry.mark for entry in result.manager.entries] == ["dir2", "dir3"]
+        result.module.exit_json.assert_called_with(
+            changed=True,
+            changes=[
+                {"action": "add", "mark": "dir3", "path": DIR3},
+                {"action": "delete", "mark": "dir1", "path": DIR1},
+            ],
+        )
+
+    def test_combined_with_mark(self) -> None:
+        result = mock_main(
+            params={
+                "mark": "dir1",
+                "path": DIR1,
+                "marks": [{"mark": "dir2", "path": DIR2, "state": "present"}],
+                "sorted": True,
+            }
+        )
+        assert len(read(result.params["sdirs"])) == 2
+
+    def test_unchanged(self) -> None:
+        manager = create_sdirs([("dir1", DIR1), ("dir2", DIR2)])
+        result = mock_main(
+            params={
+                "sdirs": manager.path,
+                "marks": [
+                    {"mark": "dir1", "path": DIR1, "state": "present"},
+                    {"mark": "dir2", "path": DIR2, "state": "present"},
+                ],
+            }
+        )
+        result.module.exit_json.assert_called_with(changed=False)
+
+    def test_invalid_mark(self) -> None:
+        result = mock_main(
+            params={"marks": [{"mark": "l l", "path": DIR1, "state": "present"}]}
+        )
+        result.module.fail_json.assert_called_with(
+            msg="Invalid mark string: “l l”. Allowed characters for bookmark "
+            "names are: “0-9a-zA-Z_”."
+        )
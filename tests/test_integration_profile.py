@@ -0,0 +1,87 @@
+import os
+import pstats
+
+from shellmarks import PhaseTimer
+
+from ._helper import (
+    DIR1,
+    DIR2,
+    create_tmp_text_file_with_content,
+    mock_main,
+    tmp_file,
+)
+
+
+class TestPhaseTimer:
+    def test_phase(self) -> None:
+        timer = PhaseTimer()
+        with timer.phase("load"):
+            pass
+        with timer.phase("load"):
+            pass
+        assert timer.timings["load"]["calls"] == 2
+        assert timer.timings["load"]["seconds"] >= 0
+
+    def test_exception(self) -> None:
+        timer = PhaseTimer()
+        try:
+            with timer.phase("load"):
+                raise ValueError()
+        except ValueError:
+            pass
+        assert timer.timings["load"]["calls"] == 1
+
+    def test_disabled(self) -> None:
+        timer = PhaseTimer(enabled=False)
+        with timer.phase("load"):
+            pass
+        assert timer.timings == {}
+
+
+class TestProfile:
+    def test_timings(self) -> None:
+        result = mock_main(
+            {
+                "marks": [
+                    {"mark": "dir1", "path": DIR1, "state": "present"},
+                    {"mark": "dir2", "path": DIR2, "state": "present"},
+                ],
+                "sorted": True,
+                "delete_duplicates": True,
+                "profile": True,
+            }
+        )
+        timings = result.module.exit_json.call_args.kwargs["timings"]
+        assert set(timings) == {
+            "already_present",
+            "load",
+            "marks",
+            "delete_duplicates",
+            "sort",
+            "changed",
+            "write",
+        }
+        # The mark of the options mark and path is None.
+        assert timings["marks"]["calls"] == 3
+        assert timings["load"]["calls"] == 1
+        assert result.module.exit_json.call_args.kwargs["changed"]
+
+    def test_already_present(self) -> None:
+        sdirs = create_tmp_text_file_with_content('export DIR_dir1="{}"\n'.format(DIR1))
+        result = mock_main(
+            {"sdirs": sdirs, "mark": "dir1", "path": DIR1, "profile": True}
+        )
+        kwargs = result.module.exit_json.call_args.kwargs
+        assert not kwargs["changed"]
+        assert list(kwargs["timings"]) == ["already_present"]
+
+    def test_no_timings(self) -> None:
+        result = mock_main({"mark": "dir1", "path": DIR1})
+        assert "timings" not in result.module.exit_json.call_args.kwargs
+
+    def test_profile_output(self) -> None:
+        output = tmp_file()
+        mock_main({"mark": "dir1", "path": DIR1, "profile_output": output})
+        assert os.path.getsize(output) > 0
+        stats = pstats.Stats(output)
+        assert any(function[2] == "run_module" for function in stats.stats)  # type: ignore
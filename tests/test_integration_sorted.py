@@ -61,3 +61,11 @@ class TestSortTrue:
         assert result.manager.entries[1].mark == "dirC"
         assert result.manager.entries[2].mark == "dirA"
         result.module.exit_json.assert_called_with(changed=False)
+
+    def test_sorted_true_already_sorted(self) -> None:
+        manager = create_sdirs([("dirA", DIR1), ("dirB", DIR2), ("dirC", DIR3)])
+        result = mock_main(
+            params={"sorted": True, "sdirs": manager.path}, check_mode=False
+        )
+        assert result.manager.entries[0].mark == "dirA"
+        result.module.exit_json.assert_called_with(changed=False)
@@ -101,10 +101,5 @@ class TestStateAbsent:
                     "mark": "tmp1",
                     "path": DIR1,
                 },
-                {
-                    "action": "sort",
-                    "sort_by": "mark",
-                    "reverse": False,
-                },
             ],
         )
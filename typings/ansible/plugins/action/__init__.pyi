@@ -0,0 +1,44 @@
+from typing import Any, Optional
+
+class ActionBase:
+    _task: Any
+    _connection: Any
+    _play_context: Any
+    _supports_check_mode: bool
+    _supports_async: bool
+
+    def __init__(
+        self,
+        task: Any,
+        connection: Any,
+        play_context: Any,
+        loader: Any,
+        templar: Any,
+        shared_loader_obj: Any = ...,
+    ) -> None: ...
+    def run(
+        self, tmp: Optional[str] = ..., task_vars: Optional[dict[str, Any]] = ...
+    ) -> dict[str, Any]: ...
+    def _execute_module(
+        self,
+        module_name: Optional[str] = ...,
+        module_args: Optional[dict[str, Any]] = ...,
+        tmp: Optional[str] = ...,
+        task_vars: Optional[dict[str, Any]] = ...,
+        persist_files: bool = ...,
+        delete_remote_tmp: Optional[bool] = ...,
+        wrap_async: bool = ...,
+    ) -> dict[str, Any]: ...
+    def _low_level_execute_command(
+        self,
+        cmd: str,
+        sudoable: bool = ...,
+        in_data: Optional[str] = ...,
+        executable: Optional[str] = ...,
+        encoding_errors: str = ...,
+        chdir: Optional[str] = ...,
+    ) -> dict[str, Any]: ...
+    def _remote_expand_user(
+        self, path: str, sudoable: bool = ..., pathsep: Optional[str] = ...
+    ) -> str: ...
+    def _remove_tmp_path(self, tmp_path: Optional[str], force: bool = ...) -> None: ...
@@ -0,0 +1,5 @@
+from typing import Any
+
+def merge_hash(
+    x: dict[str, Any], y: dict[str, Any], recursive: bool = ..., list_merge: str = ...
+) -> dict[str, Any]: ...